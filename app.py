@@ -3,18 +3,28 @@ Exoplanet Detection Web Application
 Flask Backend API
 """
 
-from flask import Flask, request, jsonify, render_template, send_file
-import joblib
+from flask import Flask, request, jsonify, render_template
 import numpy as np
 import pandas as pd
 import os
+import time
+import uuid
+import threading
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from openai import OpenAI
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
 from db import DatabaseManager
-from model_training import train_model
+from model_training import train_model, train_model_out_of_core
 from image_gen import generate_exoplanet_image
+from profiling import init_profiling
+from prediction_log import PredictionLog, input_hash
+from artifacts import load_artifacts, has_native_artifacts, has_legacy_artifacts, convert_legacy_artifacts
+from drift import DriftMonitor
+from features import FeatureEncoder, predict_proba, feature_contributions, IMPUTATION_MODES
+from similarity import NeighborIndex, scaler_fingerprint, INDEX_PATH
+from http_cache import send_precompressed, gzip_file, PrecomputedJSON
+from streaming_upload import iter_request_file, CsvBatchParser, create_job, get_job, ingest_in_background
 
 # Load environment variables
 load_dotenv()
@@ -22,16 +32,15 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__, static_folder='static')
 CORS(app)  # Enable CORS for all routes
+init_profiling(app)  # Opt-in request profiling (PROFILING_ADMIN_TOKEN)
 
 # Create static folder for generated images
 os.makedirs('static/generated', exist_ok=True)
 
-# File upload configuration
-UPLOAD_FOLDER = 'uploads'
+# File upload configuration (uploads are streamed, never written to disk)
 ALLOWED_EXTENSIONS = {'csv'}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+UPLOAD_MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 1GB for streamed CSV uploads
 
 # Initialize OpenAI client for habitability analysis
 try:
@@ -68,23 +77,63 @@ except Exception as e:
     openai_client = None
     llm_enabled = False
 
-# Load the trained model, scaler, and feature names
-MODEL_PATH = 'models/xgb_model.pkl'
-SCALER_PATH = 'models/scaler.pkl'
-FEATURES_PATH = 'models/feature_names.pkl'
+# Load the trained model, preprocessing parameters and feature names
+MODEL_DIR = 'models'
+
+def load_models():
+    """
+    Open the native artifact set (see artifacts.py); the booster itself is
+    only parsed on the first prediction. Pickles from older trainings are
+    converted once.
+    """
+    if not has_native_artifacts(MODEL_DIR) and has_legacy_artifacts(MODEL_DIR):
+        print("🔄 Converting pickled model files to the native format...")
+        convert_legacy_artifacts(MODEL_DIR)
+    artifacts = load_artifacts(MODEL_DIR)
+    # Training medians are optional: models trained before they were saved only support NaN imputation
+    encoder = FeatureEncoder.from_arrays(artifacts.feature_names, artifacts.mean, artifacts.scale,
+                                         artifacts.feature_medians)
+    return artifacts, encoder
+
+def create_drift_monitor(artifacts):
+    """Monitor of served inputs against the model's training data, None for models saved without a reference"""
+    reference = artifacts.drift_reference
+    if reference is None:
+        return None
+    return DriftMonitor(artifacts.feature_names, reference, artifacts.mean, artifacts.scale, artifacts.model_version)
 
 print("Loading models...")
 try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    feature_names = joblib.load(FEATURES_PATH)
+    model_artifacts, feature_encoder = load_models()
+    model = model_artifacts.model
+    model_version = model_artifacts.model_version
+    feature_names = model_artifacts.feature_names
+    drift_monitor = create_drift_monitor(model_artifacts)
     print("✅ Models loaded successfully!")
     print(f"✅ Features: {len(feature_names)} features loaded")
 except Exception as e:
     print(f"❌ Error loading models: {e}")
+    model_artifacts = None
     model = None
-    scaler = None
+    model_version = None
     feature_names = None
+    feature_encoder = None
+    drift_monitor = None
+
+# Served predictions, written to Postgres in the background
+prediction_log = PredictionLog(DatabaseManager(table_name='tess_dataset'))
+
+# Serialized /api/features response, rebuilt when the model changes
+FEATURES_MAX_AGE = 300
+features_response = None
+
+# Exported dataset served by /api/download-dataset
+DATASET_PATH = 'whole_dataset.csv'
+
+# Similar-planet index, loaded or built on first use
+neighbor_index = None
+neighbor_index_mtime = None
+neighbor_index_lock = threading.Lock()
 
 # Feature metadata for better UI
 FEATURE_METADATA = {
@@ -137,29 +186,96 @@ def index():
 
 @app.route('/api/features', methods=['GET'])
 def get_features():
-    """Return the list of features and their metadata"""
+    """
+    Return the list of features and their metadata
+    Built once per model version and served with an ETag, so repeat page loads get a 304
+    """
+    global features_response
     if feature_names is None:
         return jsonify({'error': 'Features not loaded'}), 500
+
+    if features_response is None or features_response.version != model_version:
+        features_with_metadata = []
+        for feature in feature_names:
+            metadata = FEATURE_METADATA.get(feature, {'label': feature, 'group': 'Other'})
+            features_with_metadata.append({
+                'name': feature,
+                'label': metadata['label'],
+                'group': metadata['group']
+            })
+        features_response = PrecomputedJSON({'features': features_with_metadata}, model_version, FEATURES_MAX_AGE)
+
+    return features_response.response()
+
+def explain_requested():
+    """True when the request asks for per-feature attributions (?explain=1)"""
+    return request.args.get('explain', '').lower() in ('1', 'true', 'yes')
+
+def get_top_features():
+    """Number of attributions to return per row (?top=N, 0 for all)"""
+    try:
+        return max(int(request.args.get('top', 10)), 0)
+    except ValueError:
+        raise ValueError('top must be an integer')
+
+def format_attributions(contributions, bias, top=10):
+    """
+    Map one row of TreeSHAP contributions (log-odds) to feature labels and groups
+    Features are sorted by absolute contribution, groups sum their features
+    """
+    order = np.argsort(-np.abs(contributions), kind='stable')
+    if top:
+        order = order[:top]
     
-    features_with_metadata = []
-    for feature in feature_names:
-        metadata = FEATURE_METADATA.get(feature, {'label': feature, 'group': 'Other'})
-        features_with_metadata.append({
-            'name': feature,
+    groups = {}
+    for feature, value in zip(feature_names, contributions.tolist()):
+        group = FEATURE_METADATA.get(feature, {'group': 'Other'})['group']
+        groups[group] = groups.get(group, 0.0) + value
+    
+    features = []
+    for i in order:
+        metadata = FEATURE_METADATA.get(feature_names[i], {'label': feature_names[i], 'group': 'Other'})
+        features.append({
+            'name': feature_names[i],
             'label': metadata['label'],
-            'group': metadata['group']
+            'group': metadata['group'],
+            'contribution': float(contributions[i])
         })
     
-    return jsonify({'features': features_with_metadata})
+    return {
+        'base_value': float(bias),
+        'margin': float(bias + contributions.sum()),
+        'features': features,
+        'groups': [
+            {'group': group, 'contribution': value}
+            for group, value in sorted(groups.items(), key=lambda item: -abs(item[1]))
+        ]
+    }
+
+def get_imputation_mode():
+    """
+    Read the optional `impute` query parameter ('nan' or 'median')
+    Falls back to NaN when no training medians are available
+    """
+    mode = request.args.get('impute')
+    if mode is None:
+        return None
+    if mode not in IMPUTATION_MODES:
+        raise ValueError(f"Invalid impute mode '{mode}', expected one of: {', '.join(IMPUTATION_MODES)}")
+    if mode == 'median' and not feature_encoder.has_medians:
+        return 'nan'
+    return mode
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """
     Predict exoplanet detection
     Expects JSON with feature values
+    With ?impute=nan|median, missing features are imputed instead of rejected
+    With ?explain=1, per-feature attributions are included (?top=N, 0 for all)
     """
     try:
-        if model is None or scaler is None or feature_names is None:
+        if model is None or feature_encoder is None:
             return jsonify({'error': 'Models not loaded properly'}), 500
         
         # Get data from request
@@ -168,31 +284,28 @@ def predict():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Extract features in correct order
-        features = []
-        missing_features = []
-        
-        for feature_name in feature_names:
-            if feature_name in data:
-                try:
-                    features.append(float(data[feature_name]))
-                except (ValueError, TypeError):
-                    return jsonify({'error': f'Invalid value for {feature_name}'}), 400
-            else:
-                missing_features.append(feature_name)
-        
-        if missing_features:
-            return jsonify({'error': f'Missing features: {", ".join(missing_features)}'}), 400
-        
-        # Convert to numpy array and reshape
-        X = np.array(features).reshape(1, -1)
+        started = time.perf_counter()
         
-        # Apply scaling
-        X_scaled = scaler.transform(X)
+        # Encode features straight into the scaled float32 input buffer
+        try:
+            impute = get_imputation_mode()
+            top = get_top_features()
+            X_scaled, imputed_features = feature_encoder.encode(data, impute=impute)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        prediction_hash = input_hash(X_scaled, impute, imputed_features)
         
         # Make prediction
-        prediction = model.predict(X_scaled)[0]
-        prediction_proba = model.predict_proba(X_scaled)[0]
+        exoplanet_proba = float(predict_proba(model, X_scaled)[0])
+        if drift_monitor is not None:
+            drift_monitor.observe(X_scaled, [imputed_features])
+        attributions = None
+        if explain_requested():
+            contributions, bias = feature_contributions(model, X_scaled, feature_names)
+            attributions = format_attributions(contributions[0], bias[0], top)
+        prediction = int(exoplanet_proba > 0.5)
+        model_ms = (time.perf_counter() - started) * 1000.0
+        prediction_proba = (1.0 - exoplanet_proba, exoplanet_proba)
         
         # Prepare response
         result = {
@@ -206,41 +319,225 @@ def predict():
             'label': 'Exoplanet Detected! 🌟' if prediction == 1 else 'Not an Exoplanet ❌'
         }
         
+        if impute is not None:
+            result['imputation'] = impute
+            result['imputed_features'] = imputed_features
+        
+        if attributions is not None:
+            result['attributions'] = attributions
+        
         # If it's an exoplanet, analyze habitability and generate visualization
+        habitability_ms = visualization_ms = None
+        served_from_log = False
         if prediction == 1:
-            print("🌍 Analyzing habitability...")
-            if llm_enabled and openai_client is not None:
-                habitability_result = analyze_habitability(data)
-                result['habitability'] = habitability_result
+            # Results of a candidate already analyzed under this model are served from the log
+            previous = prediction_log.lookup(prediction_hash, model_version)
+            previous = previous['response'] if previous is not None else {}
+            
+            if (previous.get('habitability') or {}).get('success'):
+                result['habitability'] = previous['habitability']
+                served_from_log = True
             else:
-                print("⚠️ LLM not enabled or client not available")
-                result['habitability'] = {
-                    'error': 'LLM not available',
-                    'habitability_score': None,
-                    'explanation': 'Habitability analysis requires OpenAI API key',
-                    'success': False
-                }
+                print("🌍 Analyzing habitability...")
+                habitability_started = time.perf_counter()
+                if llm_enabled and openai_client is not None:
+                    habitability_result = analyze_habitability(data)
+                    result['habitability'] = habitability_result
+                else:
+                    print("⚠️ LLM not enabled or client not available")
+                    result['habitability'] = {
+                        'error': 'LLM not available',
+                        'habitability_score': None,
+                        'explanation': 'Habitability analysis requires OpenAI API key',
+                        'success': False
+                    }
+                habitability_ms = (time.perf_counter() - habitability_started) * 1000.0
             
             # Generate visualization regardless of LLM status
-            print("🎨 Generating exoplanet visualization...")
-            visualization_result = generate_exoplanet_image(data)
-            result['visualization'] = visualization_result
+            if (previous.get('visualization') or {}).get('success'):
+                result['visualization'] = previous['visualization']
+                served_from_log = True
+            else:
+                print("🎨 Generating exoplanet visualization...")
+                visualization_started = time.perf_counter()
+                visualization_result = generate_exoplanet_image(data)
+                result['visualization'] = visualization_result
+                visualization_ms = (time.perf_counter() - visualization_started) * 1000.0
         else:
             result['habitability'] = None
             result['visualization'] = None
+        result['served_from_log'] = served_from_log
             
         print(f"Prediction result: {result}")
         
+        # Queued for the background writer, never waits on the database
+        prediction_log.record({
+            'created_at': time.time(),
+            'model_version': model_version,
+            'input_hash': prediction_hash,
+            # Only the model's features: bounds the size of each queued entry
+            'input': {name: data[name] for name in feature_names if name in data},
+            'prediction': prediction,
+            'probability': exoplanet_proba,
+            'response': result,
+            'served_from_log': served_from_log,
+            'model_ms': model_ms,
+            'habitability_ms': habitability_ms,
+            'visualization_ms': visualization_ms,
+            'total_ms': (time.perf_counter() - started) * 1000.0
+        })
+        
         return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/predict-batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict exoplanet detection for many candidates at once
+    Expects JSON as a list of feature dicts or a dict of feature columns,
+    or a raw CSV body (Content-Type: text/csv); extra CSV columns are ignored
+    With ?impute=nan|median, missing features are imputed instead of rejected
+    With ?explain=1, per-feature attributions are included (?top=N, 0 for all)
+    Habitability analysis and visualization are not run for batches
+    """
+    try:
+        if model is None or feature_encoder is None:
+            return jsonify({'error': 'Models not loaded properly'}), 500
+        
+        if request.mimetype == 'text/csv':
+            try:
+                df = pd.read_csv(request.stream)
+            except Exception as e:
+                return jsonify({'error': f'Invalid CSV: {str(e)}'}), 400
+            data = {column: df[column].to_numpy() for column in df.columns}
+        else:
+            data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        try:
+            impute = get_imputation_mode()
+            top = get_top_features()
+            X_scaled, imputed_features = feature_encoder.encode_batch(data, impute=impute)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        probabilities = predict_proba(model, X_scaled)
+        if drift_monitor is not None:
+            drift_monitor.observe(X_scaled, imputed_features)
+        explain = explain_requested()
+        if explain:
+            # One batched TreeSHAP pass for every row
+            contributions, bias = feature_contributions(model, X_scaled, feature_names)
+        
+        predictions = []
+        for i, (p, imputed) in enumerate(zip(probabilities.tolist(), imputed_features)):
+            row = {
+                'prediction': int(p > 0.5),
+                'is_exoplanet': bool(p > 0.5),
+                'confidence': float(p)
+            }
+            if impute is not None:
+                row['imputed_features'] = imputed
+            if explain:
+                row['attributions'] = format_attributions(contributions[i], bias[i], top)
+            predictions.append(row)
+        
+        response = {
+            'count': len(predictions),
+            'predictions': predictions
+        }
+        if impute is not None:
+            response['imputation'] = impute
+            response['rows_imputed'] = sum(1 for imputed in imputed_features if imputed)
+        
+        return jsonify(response)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Rows explained by one /api/explain/catalog request, whether paged or by row_hash
+EXPLAIN_CATALOG_MAX_ROWS = 500
+
+@app.route('/api/explain/catalog', methods=['GET'])
+def explain_catalog():
+    """
+    Per-feature attributions for stored catalog rows
+    Query parameters: offset, limit (max 500) or row_hash (comma separated, max 500), top
+    Attributions are cached in the database per model version
+    """
+    try:
+        if model is None or feature_encoder is None:
+            return jsonify({'error': 'Models not loaded properly'}), 500
+        
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 50)), 1), EXPLAIN_CATALOG_MAX_ROWS)
+            top = get_top_features()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        row_hashes = request.args.get('row_hash')
+        row_hashes = list(dict.fromkeys(row_hashes.split(','))) if row_hashes else None
+        if row_hashes is not None and len(row_hashes) > EXPLAIN_CATALOG_MAX_ROWS:
+            return jsonify({'error': f'At most {EXPLAIN_CATALOG_MAX_ROWS} row hashes per request'}), 400
+        
+        db = DatabaseManager(table_name='tess_dataset', feature_names=feature_names)
+        if row_hashes is not None:
+            limit = len(row_hashes)
+        rows = db.fetch_rows(offset=offset, limit=limit, row_hashes=row_hashes)
+        if rows.empty:
+            return jsonify({'model_version': model_version, 'rows': [], 'cached': 0, 'computed': 0})
+        
+        hashes = rows['row_hash'].tolist()
+        cached = db.get_attributions(model_version, hashes)
+        
+        # Compute every uncached row of the page in one batched TreeSHAP pass
+        missing = [i for i, row_hash in enumerate(hashes) if row_hash not in cached]
+        if missing:
+            subset = rows.iloc[missing].reindex(columns=feature_names)
+            X_scaled, _ = feature_encoder.encode_batch(
+                {name: subset[name].to_numpy() for name in feature_names}, impute='nan'
+            )
+            contributions, bias = feature_contributions(model, X_scaled, feature_names)
+            computed = {
+                hashes[i]: contributions[j].tolist() + [float(bias[j])]
+                for j, i in enumerate(missing)
+            }
+            save_result = db.save_attributions(model_version, computed)
+            if not save_result.get('success'):
+                print(f"⚠️  Could not cache attributions: {save_result.get('error')}")
+            cached.update(computed)
+        
+        results = []
+        for row_hash, label in zip(hashes, rows['tfopwg_disp'].tolist()):
+            values = np.asarray(cached[row_hash], dtype=np.float64)
+            attributions = format_attributions(values[:-1], values[-1], top)
+            confidence = 1.0 / (1.0 + np.exp(-attributions['margin']))
+            results.append({
+                'row_hash': row_hash,
+                'label': int(label),
+                'confidence': float(confidence),
+                'attributions': attributions
+            })
+        
+        return jsonify({
+            'model_version': model_version,
+            'rows': results,
+            'cached': len(hashes) - len(missing),
+            'computed': len(missing)
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/example', methods=['GET'])
 def get_example():
     """Return an example from the dataset"""
     try:
-        df = pd.read_csv('whole_dataset.csv')
+        df = pd.read_csv(DATASET_PATH)
         
         # Get a random row (excluding the target column)
         row = df.sample(n=1).iloc[0]
@@ -267,12 +564,58 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'model_loaded': model is not None,
-        'scaler_loaded': scaler is not None,
+        'booster_loaded': model is not None and model.loaded,
+        'scaler_loaded': feature_encoder is not None,
         'features_loaded': feature_names is not None,
         'num_features': len(feature_names) if feature_names is not None else 0,
+        'model_version': model_version,
         'llm_enabled': llm_enabled
     })
 
+@app.route('/api/predictions', methods=['GET'])
+def list_predictions():
+    """
+    Logged /api/predict calls, newest first
+    Filters: ?model_version=, ?input_hash=, ?prediction=0|1; paging with ?limit= (max 500) and ?offset=
+    Entries reach the database within a few seconds of being served
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+            offset = max(int(request.args.get('offset', 0)), 0)
+            prediction = request.args.get('prediction')
+            prediction = int(prediction) if prediction is not None else None
+        except ValueError:
+            return jsonify({'error': 'limit, offset and prediction must be integers'}), 400
+        
+        db = DatabaseManager(table_name='tess_dataset')
+        rows = db.get_predictions(limit=limit, offset=offset, model_version=request.args.get('model_version'),
+                                  input_hash=request.args.get('input_hash'), prediction=prediction)
+        for row in rows:
+            row['created_at'] = row['created_at'].isoformat()
+        return jsonify({'predictions': rows, 'log': prediction_log.stats()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/drift', methods=['GET'])
+def drift_report():
+    """
+    Drift of the inputs served since startup (or the last reset) from the training data
+    Per-feature PSI and KS scores, mean/std shift in training standard deviations,
+    and a retrain_recommended flag
+    """
+    if drift_monitor is None:
+        return jsonify({'error': 'No drift reference stored with this model, retrain it to create one'}), 404
+    return jsonify(drift_monitor.report())
+
+@app.route('/api/drift/reset', methods=['POST'])
+def drift_reset():
+    """Start a new drift observation window"""
+    if drift_monitor is None:
+        return jsonify({'error': 'No drift reference stored with this model, retrain it to create one'}), 404
+    drift_monitor.reset()
+    return jsonify({'success': True})
+
 def analyze_habitability(exoplanet_data):
     """
     Analyze exoplanet habitability using LLM
@@ -397,6 +740,126 @@ def get_habitability():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def load_neighbor_index():
+    """
+    Return the persisted similarity index for the current scaler, or None
+    Reloads when another worker has saved a newer index file
+    """
+    global neighbor_index, neighbor_index_mtime
+    fingerprint = scaler_fingerprint(feature_encoder)
+    if os.path.exists(INDEX_PATH):
+        mtime = os.path.getmtime(INDEX_PATH)
+        if neighbor_index is None or mtime != neighbor_index_mtime:
+            try:
+                loaded = NeighborIndex.load(INDEX_PATH)
+                if loaded.fingerprint == fingerprint:
+                    neighbor_index, neighbor_index_mtime = loaded, mtime
+            except Exception as e:
+                # Pickles break across library upgrades; the caller rebuilds from the table
+                print(f"⚠️  Discarding unreadable similarity index: {e}")
+                if os.path.exists(INDEX_PATH) and os.path.getmtime(INDEX_PATH) == mtime:
+                    os.remove(INDEX_PATH)
+    if neighbor_index is not None and neighbor_index.fingerprint != fingerprint:
+        neighbor_index = None
+    return neighbor_index
+
+def build_neighbor_index():
+    """Build the similarity index from the whole table and persist it"""
+    global neighbor_index, neighbor_index_mtime
+    print("🔄 Building similarity index...")
+    db = DatabaseManager(table_name='tess_dataset', feature_names=feature_names)
+    neighbor_index = NeighborIndex.build(feature_encoder, db.iter_chunks(include_hash=True))
+    neighbor_index.save(INDEX_PATH)
+    neighbor_index_mtime = os.path.getmtime(INDEX_PATH)
+    print(f"✅ Similarity index built: {len(neighbor_index)} rows")
+    return neighbor_index
+
+def update_neighbor_index(inserted_rows):
+    """
+    Add freshly ingested rows to the similarity index, if one exists yet
+    `inserted_rows` is None after very large uploads: the index is then
+    dropped and rebuilt from the table by the next query
+    """
+    global neighbor_index, neighbor_index_mtime
+    with neighbor_index_lock:
+        if inserted_rows is None:
+            neighbor_index = None
+            if os.path.exists(INDEX_PATH):
+                os.remove(INDEX_PATH)
+            return
+        index = load_neighbor_index()
+        if index is None:
+            return  # The next query builds it from the table, new rows included
+        index.add(feature_encoder, inserted_rows)
+        index.save(INDEX_PATH)
+        neighbor_index_mtime = os.path.getmtime(INDEX_PATH)
+
+@app.route('/api/similar', methods=['POST'])
+def similar_planets():
+    """
+    Find the catalog rows closest to a candidate in the scaled feature space
+    Expects JSON with feature values (missing ones are treated as the mean)
+    Query parameters: k (default 5, max 50), label (0 or 1) to restrict matches
+    """
+    try:
+        if feature_encoder is None:
+            return jsonify({'error': 'Models not loaded properly'}), 500
+        
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        try:
+            k = min(max(int(request.args.get('k', 5)), 1), 50)
+            label = request.args.get('label')
+            label = int(label) if label is not None else None
+            point, imputed_features = feature_encoder.encode(data, impute='nan')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        with neighbor_index_lock:
+            index = load_neighbor_index() or build_neighbor_index()
+        
+        start = time.perf_counter()
+        neighbors = index.query(point, k=k, label=label)
+        query_time_ms = (time.perf_counter() - start) * 1000.0
+        
+        return jsonify({
+            'neighbors': neighbors,
+            'k': k,
+            'index_size': len(index),
+            'imputed_features': imputed_features,
+            'query_time_ms': query_time_ms
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/similar/rebuild', methods=['POST'])
+def rebuild_similarity_index():
+    """
+    Rebuild the similarity index from the database
+    Index files are per-deployment caches; this re-syncs them with the table
+    """
+    try:
+        if feature_encoder is None:
+            return jsonify({'error': 'Models not loaded properly'}), 500
+        
+        with neighbor_index_lock:
+            index = build_neighbor_index()
+        
+        return jsonify({
+            'success': True,
+            'index_size': len(index)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -404,58 +867,104 @@ def allowed_file(filename):
 @app.route('/api/upload-csv', methods=['POST'])
 def upload_csv():
     """
-    Upload CSV file and add data to PostgreSQL database
+    Stream a CSV upload into the PostgreSQL database
+    The body is parsed, validated and inserted in batches while it arrives,
+    without a temporary file, and rejected as soon as it turns out malformed
+    Accepts multipart/form-data (field 'file') or a raw text/csv body
+    Query parameters: job_id to poll progress at /api/upload-jobs/<job_id>,
+    background=1 to respond once the body is received (202) and finish the
+    database work in the background
     """
+    job = None
     try:
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        if feature_names is None:
+            return jsonify({'error': 'Features not loaded'}), 500
         
-        file = request.files['file']
+        # Streaming keeps memory flat, so CSV uploads get a larger limit
+        request.max_content_length = UPLOAD_MAX_CONTENT_LENGTH
         
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        db = DatabaseManager(table_name='tess_dataset', feature_names=feature_names)
+        background = request.args.get('background', '').lower() in ('1', 'true', 'yes')
         
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Only CSV files are allowed'}), 400
+        try:
+            job = create_job(request.args.get('job_id') or uuid.uuid4().hex, request.content_length)
+            chunks = iter_request_file(
+                request.stream, request.mimetype,
+                boundary=request.mimetype_params.get('boundary'),
+                allowed_file=allowed_file
+            )
+            # Reads just enough of the body to validate the header
+            parser = CsvBatchParser(job.track(chunks), db)
+        except ValueError as e:
+            if job is not None:
+                job.finish({'success': False, 'error': str(e)})
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Save the uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        def ingest(batches):
+            # Inserted rows are only held back when there is a similarity index to update
+            on_inserted = update_neighbor_index if os.path.exists(INDEX_PATH) else None
+            result = db.ingest_batches(batches, on_inserted=on_inserted, progress=job.progress)
+            if result.get('success'):
+                result['ignored_columns'] = parser.ignored_columns
+                count_result = db.get_row_count()
+                result['total_rows'] = count_result.get('count', 0) if count_result.get('success') else 0
+            return result
         
-        # Add data to database
-        db = DatabaseManager(table_name='tess_dataset')
-        result = db.add_csv_to_database(filepath)
+        if background:
+            try:
+                ingest_in_background(job, parser, ingest)
+            except ValueError as e:
+                return jsonify({'success': False, 'job_id': job.job_id, 'error': str(e)}), 400
+            return jsonify({
+                'success': True,
+                'job_id': job.job_id,
+                'status_url': f'/api/upload-jobs/{job.job_id}',
+                'rows_received': job.rows_received
+            }), 202
+        
+        result = ingest(parser)
+        job.finish(result)
         
         if not result.get('success'):
+            if result.get('invalid_data'):
+                return jsonify({'success': False, 'job_id': job.job_id, 'error': result.get('error')}), 400
             return jsonify({
                 'success': False,
+                'job_id': job.job_id,
                 'error': f"Database error: {result.get('error')}"
             }), 500
         
         rows_inserted = result.get('rows_inserted', 0)
-        
-        # Get updated row count
-        count_result = db.get_row_count()
-        total_rows = count_result.get('count', 0) if count_result.get('success') else 0
-        
-        # Clean up uploaded file
-        os.remove(filepath)
+        duplicates_skipped = result.get('duplicates_skipped', 0)
         
         return jsonify({
             'success': True,
-            'message': f'Successfully added {rows_inserted} rows to database',
+            'job_id': job.job_id,
+            'message': f'Successfully added {rows_inserted} rows to database ({duplicates_skipped} duplicates skipped)',
             'rows_inserted': rows_inserted,
-            'total_rows': total_rows
+            'duplicates_skipped': duplicates_skipped,
+            'ignored_columns': result.get('ignored_columns', []),
+            'total_rows': result.get('total_rows', 0)
         })
         
     except Exception as e:
+        if job is not None and job.finished_at is None:
+            job.finish({'success': False, 'error': str(e)})
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/upload-jobs/<job_id>', methods=['GET'])
+def upload_job_status(job_id):
+    """
+    Progress of a running or recently finished CSV upload
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Upload job not found'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/api/export-dataset', methods=['POST'])
 def export_dataset():
     """
@@ -465,7 +974,7 @@ def export_dataset():
         db = DatabaseManager(table_name='tess_dataset')
         
         # Export to CSV
-        output_path = 'whole_dataset.csv'
+        output_path = DATASET_PATH
         result = db.export_to_csv(output_path)
         
         if not result.get('success'):
@@ -473,6 +982,9 @@ def export_dataset():
                 'success': False,
                 'error': f"Export error: {result.get('error')}"
             }), 500
+
+        # Compress once here rather than on every download
+        gzip_file(output_path)
         
         return jsonify({
             'success': True,
@@ -491,18 +1003,16 @@ def export_dataset():
 def download_dataset():
     """
     Download the whole_dataset.csv file
+    Gzip-encoded when accepted, with ETag/Last-Modified (304s) and Range support
     """
     try:
-        filepath = 'whole_dataset.csv'
-        if not os.path.exists(filepath):
+        if not os.path.exists(DATASET_PATH):
             return jsonify({'error': 'Dataset not found. Please export first.'}), 404
         
-        return send_file(
-            filepath,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='whole_dataset.csv'
-        )
+        return send_precompressed(DATASET_PATH, mimetype='text/csv', download_name='whole_dataset.csv')
+    except HTTPException:
+        # 416 for unsatisfiable ranges
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -536,11 +1046,42 @@ def database_status():
 def retrain_model():
     """
     Retrain the model using all data in the database
+    With ?out_of_core=1 the table is streamed in chunks instead of loaded whole
     Returns new model performance metrics
     """
     try:
-        # Get data from database
         db = DatabaseManager(table_name='tess_dataset')
+        
+        if request.args.get('out_of_core', '').lower() in ('1', 'true', 'yes'):
+            count_result = db.get_row_count()
+            if not count_result.get('success'):
+                return jsonify({
+                    'success': False,
+                    'error': f"Database error: {count_result.get('error')}"
+                }), 500
+            
+            if count_result.get('count', 0) < 100:  # Minimum threshold for training
+                return jsonify({
+                    'success': False,
+                    'error': "Not enough data for training. Minimum 100 samples required."
+                }), 400
+            
+            try:
+                results = train_model_out_of_core(db.iter_chunks)
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': f"Error during training: {str(e)}"
+                }), 500
+            
+            reload_models()
+            return jsonify({
+                'success': True,
+                'message': 'Model retrained successfully',
+                'metrics': results
+            })
+        
+        # Get data from database
         result = db.export_to_csv('temp_training_data.csv')
         
         if not result.get('success'):
@@ -571,10 +1112,7 @@ def retrain_model():
             results = train_model(df)
             
             # Reload the model and scaler
-            global model, scaler, feature_names
-            model = joblib.load('models/xgb_model.pkl')
-            scaler = joblib.load('models/scaler.pkl')
-            feature_names = joblib.load('models/feature_names.pkl')
+            reload_models()
             
             return jsonify({
                 'success': True,
@@ -594,12 +1132,24 @@ def retrain_model():
             'error': str(e)
         }), 500
 
+def reload_models():
+    """Reload the model files written by training"""
+    global model_artifacts, model, model_version, feature_names, feature_encoder, drift_monitor
+    global neighbor_index
+    model_artifacts, feature_encoder = load_models()
+    model = model_artifacts.model
+    model_version = model_artifacts.model_version
+    feature_names = model_artifacts.feature_names
+    # Drift is measured against the new training data from here on
+    drift_monitor = create_drift_monitor(model_artifacts)
+    # The similarity index lives in the old scaler's space and is rebuilt lazily
+    neighbor_index = None
+
 if __name__ == '__main__':
     print("="*60)
     print("🚀 Exoplanet Detection API")
     print("="*60)
-    print(f"Model: {MODEL_PATH}")
-    print(f"Scaler: {SCALER_PATH}")
+    print(f"Model: {MODEL_DIR} (version {model_version})")
     print(f"Features: {len(feature_names) if feature_names else 0}")
     print("="*60)
     print("Starting server on http://localhost:5000")
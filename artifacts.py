@@ -0,0 +1,249 @@
+"""
+Model Artifacts Module
+Version-independent model files: native XGBoost booster, raw preprocessing arrays and a JSON manifest
+"""
+
+import os
+import re
+import glob
+import json
+import hashlib
+import threading
+import numpy as np
+import xgboost as xgb
+from atomic_write import write_atomically
+
+MODEL_DIR = 'models'
+MANIFEST_FILE = 'manifest.json'
+# Data files are named after the model version, e.g. xgb_model.<version>.ubj
+BOOSTER_FILE = 'xgb_model.{version}.ubj'
+PARAMS_FILE = 'preprocessing.{version}.f64'
+DRIFT_FILE = 'drift_reference.{version}.f64'
+FORMAT_VERSION = 1
+KEEP_VERSIONS = 3  # artifact sets kept for workers still running an older manifest
+
+# Rows of the preprocessing array, one column per feature
+PARAM_ROWS = ['mean', 'scale', 'median']
+
+# Pickles written before the native format, converted on first start
+LEGACY_FILES = {
+    'model': 'xgb_model.pkl',
+    'scaler': 'scaler.pkl',
+    'feature_names': 'feature_names.pkl',
+    'feature_medians': 'feature_medians.pkl'
+}
+
+
+def _content_version(data):
+    """Short content hash of the booster file, keys results cached per model"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _write_bytes(data):
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return write
+
+
+def save_artifacts(booster, mean, scale, feature_names, feature_medians=None, drift_reference=None,
+                   model_dir=MODEL_DIR):
+    """
+    Write the native artifact set.
+
+    The booster is saved in XGBoost's UBJSON model format, which any later
+    XGBoost release can read. Scaler mean/scale and the training medians are
+    stored as one raw little-endian float64 array of shape (3, n_features):
+    float64 rather than float32 because means such as `pl_tranmid`
+    (~2.46e6 BJD) lose their fractional part in float32. The optional
+    `drift_reference` (see drift.reference_statistics) is stored the same
+    way.
+
+    Every data file is named after the model version, so a worker that
+    opened an older manifest still reads the booster and arrays that belong
+    together; the last KEEP_VERSIONS versions are kept. The manifest is
+    written last, so it only ever points at complete files.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    feature_names = list(feature_names)
+
+    if isinstance(booster, xgb.XGBModel):
+        booster = booster.get_booster()
+    # The same bytes save_model writes to a .ubj file; the version is their hash
+    booster_data = bytes(booster.save_raw('ubj'))
+    version = _content_version(booster_data)
+    booster_file = BOOSTER_FILE.format(version=version)
+    write_atomically(os.path.join(model_dir, booster_file), _write_bytes(booster_data))
+
+    medians = feature_medians or {}
+    params = np.array([
+        np.asarray(mean, dtype=np.float64),
+        np.asarray(scale, dtype=np.float64),
+        [medians.get(name, np.nan) for name in feature_names]
+    ], dtype='<f8')
+    params_file = PARAMS_FILE.format(version=version)
+    write_atomically(os.path.join(model_dir, params_file), params.tofile)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model_version': version,
+        'booster': booster_file,
+        'preprocessing': {
+            'file': params_file,
+            'dtype': '<f8',
+            'shape': list(params.shape),
+            'rows': PARAM_ROWS
+        },
+        'has_medians': feature_medians is not None,
+        'feature_names': feature_names
+    }
+
+    if drift_reference is not None:
+        drift_reference = np.asarray(drift_reference, dtype='<f8')
+        drift_file = DRIFT_FILE.format(version=version)
+        write_atomically(os.path.join(model_dir, drift_file), drift_reference.tofile)
+        manifest['drift_reference'] = {
+            'file': drift_file,
+            'dtype': '<f8',
+            'shape': list(drift_reference.shape)
+        }
+
+    def write_manifest(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    write_atomically(os.path.join(model_dir, MANIFEST_FILE), write_manifest)
+    _remove_old_versions(model_dir)
+    return manifest
+
+
+def _remove_old_versions(model_dir, keep=KEEP_VERSIONS):
+    """Delete all but the `keep` most recently written versions of each data file"""
+    for pattern in (BOOSTER_FILE, PARAMS_FILE, DRIFT_FILE):
+        versioned = re.compile(re.escape(pattern).replace(re.escape('{version}'), '[0-9a-f]{16}') + '$')
+        paths = [path for path in glob.glob(os.path.join(model_dir, pattern.format(version='*')))
+                 if versioned.match(os.path.basename(path))]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[keep:]:
+            os.remove(path)
+
+
+class LazyModel:
+    """
+    Stand-in for the trained classifier that reads the booster on first use.
+
+    Exposes what prediction needs (`get_booster()` and `best_iteration`), so
+    it can be passed wherever the XGBClassifier used to be.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._booster = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._booster is not None
+
+    def get_booster(self):
+        if self._booster is None:
+            with self._lock:
+                if self._booster is None:
+                    self._booster = xgb.Booster(model_file=self.path)
+        return self._booster
+
+    @property
+    def best_iteration(self):
+        # Early stopping stores it as a booster attribute
+        best_iteration = self.get_booster().attr('best_iteration')
+        return int(best_iteration) if best_iteration is not None else None
+
+
+class ModelArtifacts:
+    """
+    A loaded artifact set.
+
+    Opening one only reads the manifest and maps the preprocessing array
+    (a few hundred bytes, shared through the page cache by every worker);
+    the booster is parsed by `model` on the first prediction.
+    """
+
+    def __init__(self, model_dir, manifest):
+        self.model_dir = model_dir
+        self.manifest = manifest
+        self.feature_names = manifest['feature_names']
+        self.model_version = manifest['model_version']
+        self.model = LazyModel(os.path.join(model_dir, manifest['booster']))
+
+        self.params = self._map(manifest['preprocessing'])
+
+    def _map(self, spec):
+        return np.memmap(os.path.join(self.model_dir, spec['file']), dtype=spec['dtype'],
+                         mode='r', shape=tuple(spec['shape']))
+
+    def _row(self, name):
+        return self.params[self.manifest['preprocessing']['rows'].index(name)]
+
+    @property
+    def mean(self):
+        return self._row('mean')
+
+    @property
+    def scale(self):
+        return self._row('scale')
+
+    @property
+    def feature_medians(self):
+        """Training medians by feature, or None for models trained without them"""
+        if not self.manifest.get('has_medians'):
+            return None
+        return {name: float(value) for name, value in zip(self.feature_names, self._row('median'))
+                if not np.isnan(value)}
+
+    @property
+    def drift_reference(self):
+        """Training-data histograms for drift monitoring, or None for models saved without them"""
+        spec = self.manifest.get('drift_reference')
+        return self._map(spec) if spec else None
+
+
+def has_native_artifacts(model_dir=MODEL_DIR):
+    return os.path.exists(os.path.join(model_dir, MANIFEST_FILE))
+
+
+def has_legacy_artifacts(model_dir=MODEL_DIR):
+    return os.path.exists(os.path.join(model_dir, LEGACY_FILES['model']))
+
+
+def load_artifacts(model_dir=MODEL_DIR):
+    """Open the native artifact set in `model_dir`"""
+    with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {manifest.get('format_version')}")
+    return ModelArtifacts(model_dir, manifest)
+
+
+def load_feature_names(model_dir=MODEL_DIR):
+    """Training feature order, from the manifest or the legacy pickle"""
+    if has_native_artifacts(model_dir):
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)['feature_names']
+    import joblib
+    return joblib.load(os.path.join(model_dir, LEGACY_FILES['feature_names']))
+
+
+def convert_legacy_artifacts(model_dir=MODEL_DIR):
+    """Rewrite the pickled model, scaler and feature names in the native format"""
+    import joblib
+    paths = {key: os.path.join(model_dir, name) for key, name in LEGACY_FILES.items()}
+    model = joblib.load(paths['model'])
+    scaler = joblib.load(paths['scaler'])
+    feature_names = joblib.load(paths['feature_names'])
+    feature_medians = joblib.load(paths['feature_medians']) if os.path.exists(paths['feature_medians']) else None
+    return save_artifacts(model, scaler.mean_, scaler.scale_, feature_names, feature_medians, model_dir=model_dir)
+
+
+if __name__ == "__main__":
+    manifest = convert_legacy_artifacts()
+    print(f"✅ Converted {len(manifest['feature_names'])}-feature model to the native format "
+          f"(version {manifest['model_version']})")
@@ -0,0 +1,41 @@
+"""
+Atomic File Writes
+Replace shared files so readers in any thread or worker only ever see complete contents
+"""
+
+import os
+import tempfile
+
+DEFAULT_MODE = 0o644
+
+
+def write_atomically(path, write):
+    """
+    Call `write(tmp_path)` on a fresh temporary file next to `path`, then
+    rename it over `path`.
+
+    The temporary name comes from mkstemp, so concurrent writers in the same
+    process never share it. It keeps the extension of `path` (XGBoost and
+    joblib pick the file format from it) and takes the permissions of the
+    file it replaces. On failure the temporary file is removed and `path` is
+    left untouched.
+    """
+    directory = os.path.dirname(path) or '.'
+    root, extension = os.path.splitext(os.path.basename(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{root}.', suffix=extension)
+    try:
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = DEFAULT_MODE
+        os.fchmod(fd, mode)
+        os.close(fd)
+        fd = None
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
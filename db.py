@@ -1,15 +1,53 @@
 import os
+import io
+import csv
+import hashlib
+import itertools
+import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+LABEL_COLUMN = 'tfopwg_disp'
+HASH_COLUMN = 'row_hash'
+# Stored as the row_hash column comment; tables hashed by another scheme are rehashed once
+HASH_SCHEME = 'blake2b-128 float64'
+ATTRIBUTIONS_TABLE = 'feature_attributions'
+PREDICTIONS_TABLE = 'prediction_log'
+PREDICTION_LOG_COLUMNS = [
+    'created_at', 'model_version', 'input_hash', 'input', 'prediction', 'probability', 'response',
+    'served_from_log', 'model_ms', 'habitability_ms', 'visualization_ms', 'total_ms'
+]
+INSERT_PAGE_SIZE = 1000
+NOTIFY_MAX_ROWS = 100000  # inserted rows held back for on_inserted, beyond this it gets None
+
+# Tables this process has already run ensure_schema on
+_migrated_tables = set()
+
+
+def compute_row_hashes(values: np.ndarray) -> list:
+    """
+    Content hash of each row of a (features + label) matrix
+
+    Values are hashed at full float64 precision: float32 cannot tell apart
+    e.g. `pl_tranmid` values ~2.46e6 less than 0.25 day apart. NaN and -0.0
+    are canonicalized so equal rows always hash equally.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    values = np.where(np.isnan(values), np.nan, values) + 0.0
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in values]
+
+
 class DatabaseManager:
-    def __init__(self, table_name: str = 'tess_dataset'):
+    def __init__(self, table_name: str = 'tess_dataset', feature_names: list = None):
         self.table_name = table_name
+        # The model's features define the table schema used for ingestion
+        self.feature_names = list(feature_names) if feature_names is not None else None
         
         # Try to get DATABASE_URL first (for cloud databases like Neon)
         database_url = os.getenv('DATABASE_URL')
@@ -36,50 +74,295 @@ class DatabaseManager:
         else:
             return psycopg2.connect(**self.connection_params)
 
-    def add_csv_to_database(self, csv_path: str) -> dict:
+    @property
+    def schema_columns(self) -> list:
+        """Feature columns followed by the label, in table order"""
+        return self.feature_names + [LABEL_COLUMN]
+
+    def ensure_schema(self, cur):
         """
-        Add CSV data as new entries into the database
+        Create the table with a fixed schema, or migrate an existing one:
+        missing columns are added, legacy rows get their content hash and
+        duplicates are removed before the unique hash index is created
+        """
+        columns = [sql.SQL("{} DOUBLE PRECISION").format(sql.Identifier(name)) for name in self.feature_names]
+        columns.append(sql.SQL("{} INTEGER NOT NULL").format(sql.Identifier(LABEL_COLUMN)))
+        columns.append(sql.SQL("{} TEXT").format(sql.Identifier(HASH_COLUMN)))
+        cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
+            sql.Identifier(self.table_name), sql.SQL(', ').join(columns)
+        ))
+
+        # Tables created from the first uploaded CSV may lack some columns
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+                    (self.table_name,))
+        existing = {row[0] for row in cur.fetchall()}
+        for name, column_type in [(name, 'DOUBLE PRECISION') for name in self.feature_names] + [(HASH_COLUMN, 'TEXT')]:
+            if name not in existing:
+                cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN {} {}").format(
+                    sql.Identifier(self.table_name), sql.Identifier(name), sql.SQL(column_type)
+                ))
+
+        cur.execute("SELECT col_description(a.attrelid, a.attnum) FROM pg_attribute a "
+                    "JOIN pg_class c ON c.oid = a.attrelid WHERE c.relname = %s AND a.attname = %s",
+                    (self.table_name, HASH_COLUMN))
+        if cur.fetchone()[0] != HASH_SCHEME:
+            # New table, or rows hashed by an older scheme
+            self._backfill_hashes(cur, rehash=True)
+            cur.execute(sql.SQL("COMMENT ON COLUMN {}.{} IS {}").format(
+                sql.Identifier(self.table_name), sql.Identifier(HASH_COLUMN), sql.Literal(HASH_SCHEME)
+            ))
+        else:
+            cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE {} IS NULL)").format(
+                sql.Identifier(self.table_name), sql.Identifier(HASH_COLUMN)
+            ))
+            if cur.fetchone()[0]:
+                self._backfill_hashes(cur)
+
+        cur.execute(sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})").format(
+            sql.Identifier(f"{self.table_name}_{HASH_COLUMN}_key"),
+            sql.Identifier(self.table_name),
+            sql.Identifier(HASH_COLUMN)
+        ))
+
+    def migrate(self):
+        """
+        Run ensure_schema once per process, before reads that need the
+        row_hash column on a table that may not have been ingested into since
+        """
+        if self.table_name in _migrated_tables:
+            return
+        if self.feature_names is None:
+            raise ValueError('feature_names are required to migrate the table')
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                self.ensure_schema(cur)
+            conn.commit()
+        finally:
+            conn.close()
+        _migrated_tables.add(self.table_name)
+
+    def _backfill_hashes(self, cur, rehash: bool = False, batch_size: int = 10000):
+        """
+        One-time migration of rows inserted before content hashing, or of
+        every row when `rehash` is set (hashes from an older scheme)
+        """
+        # Legacy REAL columns are widened exactly, as float64 uploads are hashed
+        cur.execute(sql.SQL("SELECT ctid::text, {} FROM {}{}").format(
+            sql.SQL(', ').join(sql.SQL("{}::float8").format(sql.Identifier(name)) for name in self.schema_columns),
+            sql.Identifier(self.table_name),
+            sql.SQL("") if rehash else sql.SQL(" WHERE {} IS NULL").format(sql.Identifier(HASH_COLUMN))
+        ))
+        rows = cur.fetchall()
+        update_query = sql.SQL("UPDATE {} AS t SET {} = v.hash FROM (VALUES %s) AS v (row_id, hash) "
+                               "WHERE t.ctid = v.row_id::tid").format(
+            sql.Identifier(self.table_name), sql.Identifier(HASH_COLUMN)
+        )
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = np.array([[np.nan if v is None else v for v in row[1:]] for row in batch], dtype=np.float64)
+            hashes = compute_row_hashes(values)
+            execute_values(cur, update_query, [(row[0], h) for row, h in zip(batch, hashes)],
+                           page_size=INSERT_PAGE_SIZE)
+
+        cur.execute(sql.SQL("DELETE FROM {} a USING {} b WHERE a.{} = b.{} AND a.ctid > b.ctid").format(
+            sql.Identifier(self.table_name), sql.Identifier(self.table_name),
+            sql.Identifier(HASH_COLUMN), sql.Identifier(HASH_COLUMN)
+        ))
+        if rows:
+            print(f"🔧 Hashed {len(rows)} legacy rows, removed {cur.rowcount} duplicates")
+
+        if rehash:
+            # Attributions cached under the old hashes can never be looked up again
+            cur.execute(sql.SQL("SELECT to_regclass(%s)"), (ATTRIBUTIONS_TABLE,))
+            if cur.fetchone()[0] is not None:
+                cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(ATTRIBUTIONS_TABLE)))
+
+    def validate_columns(self, columns: list) -> list:
+        """
+        Check a CSV header against the schema before any row is read
+
+        Returns:
+            list: Column names that are not part of the schema and will be ignored
+        """
+        if LABEL_COLUMN not in columns:
+            raise ValueError(f"Missing label column '{LABEL_COLUMN}'")
+
+        if not any(name in columns for name in self.feature_names):
+            raise ValueError("CSV contains none of the model features")
+
+        return [col for col in columns if col not in self.schema_columns]
+
+    def prepare_frame(self, df: pd.DataFrame, first_line: int = 2) -> np.ndarray:
+        """
+        Validate and convert a chunk of raw CSV rows to schema order
 
         Args:
-            csv_path: Path to the CSV file
+            df: Raw rows, with the CSV header as columns
+            first_line: CSV line number of the first row, for error messages
+
+        Returns:
+            np.ndarray: float64 matrix of feature + label values
+        """
+        # Absent feature columns are stored as NULL, unknown columns are dropped
+        frame = df.reindex(columns=self.schema_columns)
+        for name in self.schema_columns:
+            try:
+                frame[name] = pd.to_numeric(frame[name])
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Non-numeric value in column '{name}': {e}")
+        values = frame.to_numpy(dtype=np.float64)
+
+        missing_labels = np.flatnonzero(np.isnan(values[:, -1]))
+        if len(missing_labels):
+            raise ValueError(f"Line {first_line + missing_labels[0]}: missing '{LABEL_COLUMN}' value")
+
+        # Labels are stored as INTEGER and hashed as given, so anything but 0/1 would be altered
+        invalid_labels = np.flatnonzero((values[:, -1] != 0) & (values[:, -1] != 1))
+        if len(invalid_labels):
+            line = invalid_labels[0]
+            raise ValueError(f"Line {first_line + line}: '{LABEL_COLUMN}' must be 0 or 1, got {values[line, -1]:g}")
+
+        return values
+
+    def upsert_values(self, cur, values: np.ndarray, hashes: list = None) -> list:
+        """
+        Bulk insert prepared rows, skipping any whose content hash exists
+
+        Returns:
+            list: Hashes of the rows actually inserted
+        """
+        if hashes is None:
+            hashes = compute_row_hashes(values)
+        rows = [
+            tuple(None if v != v else v for v in row[:-1]) + (int(row[-1]), row_hash)
+            for row, row_hash in zip(values.tolist(), hashes)
+        ]
+        insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT ({}) DO NOTHING RETURNING {}").format(
+            sql.Identifier(self.table_name),
+            sql.SQL(', ').join(map(sql.Identifier, self.schema_columns + [HASH_COLUMN])),
+            sql.Identifier(HASH_COLUMN),
+            sql.Identifier(HASH_COLUMN)
+        )
+        inserted = execute_values(cur, insert_query, rows, page_size=INSERT_PAGE_SIZE, fetch=True)
+        return [row[0] for row in inserted]
+
+    def ingest_batches(self, batches, on_inserted=None, progress=None) -> dict:
+        """
+        Upsert batches of prepared rows in a single transaction, so a file
+        that turns out to be malformed halfway through leaves no rows behind
+
+        Args:
+            batches: Iterable of float64 (features + label) matrices
+            on_inserted: Optional callback receiving a DataFrame of the newly
+                inserted rows (schema columns plus row_hash) after commit, or
+                None when more than NOTIFY_MAX_ROWS rows were inserted
+            progress: Optional callback receiving (rows_received, rows_inserted)
+                after each batch
 
         Returns:
             dict: Status information about the operation
         """
+        rows_received = 0
+        rows_inserted = 0
+        inserted_values, inserted_hashes = [], []
         try:
-            df = pd.read_csv(csv_path)
             conn = self.get_connection()
             cur = conn.cursor()
+            self.ensure_schema(cur)
 
-            # Create table if it doesn't exist
-            type_mapping = {'int64': 'INTEGER', 'float64': 'REAL', 'object': 'TEXT', 'bool': 'BOOLEAN'}
-            columns = [f"{col} {type_mapping.get(str(dtype), 'TEXT')}" for col, dtype in df.dtypes.items()]
-            cur.execute(f"CREATE TABLE IF NOT EXISTS {self.table_name} ({', '.join(columns)})")
+            for values in batches:
+                hashes = compute_row_hashes(values)
+                inserted = set(self.upsert_values(cur, values, hashes))
+                rows_received += len(values)
+                rows_inserted += len(inserted)
+                if on_inserted is not None and inserted and inserted_values is not None:
+                    if rows_inserted > NOTIFY_MAX_ROWS:
+                        # Too many to hold until commit, the listener reloads from the table instead
+                        inserted_values, inserted_hashes = None, None
+                    else:
+                        mask = np.array([h in inserted for h in hashes])
+                        inserted_values.append(values[mask])
+                        inserted_hashes.extend(h for h in hashes if h in inserted)
+                if progress is not None:
+                    progress(rows_received, rows_inserted)
 
-            # Insert data
-            cols = df.columns.tolist()
-            insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-                sql.Identifier(self.table_name),
-                sql.SQL(', ').join(map(sql.Identifier, cols)),
-                sql.SQL(', '.join(['%s'] * len(cols)))
-            )
+            conn.commit()
+            _migrated_tables.add(self.table_name)
 
-            for _, row in df.iterrows():
-                cur.execute(insert_query, tuple(row))
+            if inserted_values is None:
+                self._notify_inserted(on_inserted, None, None)
+            elif inserted_hashes:
+                self._notify_inserted(on_inserted, np.vstack(inserted_values), inserted_hashes)
 
-            conn.commit()
-            return {'success': True, 'rows_inserted': len(df)}
+            return {
+                'success': True,
+                'rows_received': rows_received,
+                'rows_inserted': rows_inserted,
+                'duplicates_skipped': rows_received - rows_inserted
+            }
 
         except Exception as e:
             if 'conn' in locals():
                 conn.rollback()
-            return {'success': False, 'error': str(e)}
+            # ValueErrors come from validating the data itself, not from the database
+            return {'success': False, 'error': str(e), 'invalid_data': isinstance(e, ValueError)}
         finally:
             if 'cur' in locals():
                 cur.close()
             if 'conn' in locals():
                 conn.close()
 
+    def add_csv_to_database(self, csv_path: str, on_inserted=None, chunksize: int = 5000) -> dict:
+        """
+        Add CSV data as new entries into the database
+        Rows already present (same content hash) are skipped, so
+        re-uploading a file is a no-op
+
+        Args:
+            csv_path: Path to the CSV file
+            on_inserted: Optional callback receiving a DataFrame of the newly
+                inserted rows (schema columns plus row_hash) after commit, or
+                None when more than NOTIFY_MAX_ROWS rows were inserted
+            chunksize: Rows read and inserted per batch
+
+        Returns:
+            dict: Status information about the operation
+        """
+        if self.feature_names is None:
+            return {'success': False, 'error': 'feature_names are required to ingest data'}
+
+        try:
+            reader = pd.read_csv(csv_path, chunksize=chunksize)
+            first_chunk = next(reader, None)
+            if first_chunk is None:
+                return {'success': False, 'error': 'CSV file is empty'}
+            ignored_columns = self.validate_columns(list(first_chunk.columns))
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+        def batches():
+            line = 2
+            for chunk in itertools.chain([first_chunk], reader):
+                yield self.prepare_frame(chunk, first_line=line)
+                line += len(chunk)
+
+        result = self.ingest_batches(batches(), on_inserted=on_inserted)
+        if result.get('success'):
+            result['ignored_columns'] = ignored_columns
+        return result
+
+    def _notify_inserted(self, on_inserted, values: np.ndarray, hashes: list):
+        frame = None
+        if values is not None:
+            frame = pd.DataFrame(values, columns=self.schema_columns)
+            frame[HASH_COLUMN] = hashes
+        try:
+            on_inserted(frame)
+        except Exception as e:
+            # The rows are committed already, a failing listener must not report otherwise
+            print(f"⚠️  Post-insert callback failed: {e}")
+
     def export_to_csv(self, output_path: str) -> dict:
         """
         Export entire database table to CSV for model retraining
@@ -93,6 +376,7 @@ class DatabaseManager:
         try:
             conn = self.get_connection()
             df = pd.read_sql_query(f"SELECT * FROM {self.table_name}", conn)
+            df = df.drop(columns=[HASH_COLUMN], errors='ignore')
             df.to_csv(output_path, index=False)
 
             return {'success': True, 'rows_exported': len(df), 'output_path': output_path}
@@ -103,6 +387,216 @@ class DatabaseManager:
             if 'conn' in locals():
                 conn.close()
 
+    def iter_chunks(self, chunksize: int = 50000, include_hash: bool = False):
+        """
+        Stream the table as DataFrame chunks through a server-side cursor,
+        so only one chunk is held in memory at a time
+
+        Args:
+            chunksize: Number of rows per chunk
+            include_hash: Keep the internal row_hash column, migrating the
+                table first so it exists and is current (needs feature_names)
+
+        Yields:
+            pd.DataFrame: The next chunk of rows
+        """
+        if include_hash:
+            self.migrate()
+        conn = self.get_connection()
+        try:
+            # A named cursor keeps the result set on the server
+            with conn.cursor(name=f"{self.table_name}_stream") as cur:
+                cur.itersize = chunksize
+                cur.execute(sql.SQL("SELECT * FROM {}").format(sql.Identifier(self.table_name)))
+                while True:
+                    rows = cur.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    columns = [desc[0] for desc in cur.description]
+                    chunk = pd.DataFrame(rows, columns=columns)
+                    yield chunk if include_hash else chunk.drop(columns=[HASH_COLUMN], errors='ignore')
+        finally:
+            conn.close()
+
+    def fetch_rows(self, offset: int = 0, limit: int = 50, row_hashes: list = None) -> pd.DataFrame:
+        """
+        Fetch catalog rows (schema columns plus row_hash) in a stable order,
+        either one page of the table or the rows with the given hashes;
+        at most `limit` rows either way. The table is migrated first, so
+        it needs feature_names.
+        """
+        self.migrate()
+        conn = self.get_connection()
+        try:
+            if row_hashes is not None:
+                query = sql.SQL("SELECT * FROM {} WHERE {} = ANY(%s) ORDER BY {} LIMIT %s").format(
+                    sql.Identifier(self.table_name), sql.Identifier(HASH_COLUMN), sql.Identifier(HASH_COLUMN)
+                )
+                params = (list(row_hashes), limit)
+            else:
+                query = sql.SQL("SELECT * FROM {} ORDER BY {} LIMIT %s OFFSET %s").format(
+                    sql.Identifier(self.table_name), sql.Identifier(HASH_COLUMN)
+                )
+                params = (limit, offset)
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                columns = [desc[0] for desc in cur.description]
+                return pd.DataFrame(cur.fetchall(), columns=columns)
+        finally:
+            conn.close()
+
+    def get_attributions(self, model_version: str, row_hashes: list) -> dict:
+        """
+        Cached per-row attributions for a model version
+
+        Returns:
+            dict: row_hash -> list of contributions with the bias last
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SELECT to_regclass(%s)"), (ATTRIBUTIONS_TABLE,))
+                if cur.fetchone()[0] is None:
+                    return {}
+                cur.execute(sql.SQL("SELECT {}, contributions FROM {} WHERE model_version = %s AND {} = ANY(%s)").format(
+                    sql.Identifier(HASH_COLUMN), sql.Identifier(ATTRIBUTIONS_TABLE), sql.Identifier(HASH_COLUMN)
+                ), (model_version, list(row_hashes)))
+                return dict(cur.fetchall())
+        finally:
+            conn.close()
+
+    def save_attributions(self, model_version: str, attributions: dict) -> dict:
+        """
+        Cache per-row attributions (row_hash -> contributions with the bias last)
+        """
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} (model_version TEXT NOT NULL, {} TEXT NOT NULL, "
+                "contributions REAL[] NOT NULL, PRIMARY KEY (model_version, {}))"
+            ).format(sql.Identifier(ATTRIBUTIONS_TABLE), sql.Identifier(HASH_COLUMN), sql.Identifier(HASH_COLUMN)))
+            execute_values(cur, sql.SQL("INSERT INTO {} (model_version, {}, contributions) VALUES %s "
+                                        "ON CONFLICT DO NOTHING").format(
+                sql.Identifier(ATTRIBUTIONS_TABLE), sql.Identifier(HASH_COLUMN)
+            ), [(model_version, row_hash, values) for row_hash, values in attributions.items()],
+                page_size=INSERT_PAGE_SIZE)
+            conn.commit()
+            return {'success': True, 'rows_cached': len(attributions)}
+        except Exception as e:
+            if 'conn' in locals():
+                conn.rollback()
+            return {'success': False, 'error': str(e)}
+        finally:
+            if 'cur' in locals():
+                cur.close()
+            if 'conn' in locals():
+                conn.close()
+
+    def ensure_prediction_log(self, cur):
+        """Create the prediction log table and its lookup index if missing"""
+        cur.execute(sql.SQL("SELECT to_regclass(%s)"), (PREDICTIONS_TABLE,))
+        if cur.fetchone()[0] is not None:
+            return
+        cur.execute(sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {} ("
+            "id BIGSERIAL PRIMARY KEY, created_at TIMESTAMPTZ NOT NULL, model_version TEXT, "
+            "input_hash TEXT NOT NULL, input JSONB NOT NULL, prediction SMALLINT NOT NULL, "
+            "probability DOUBLE PRECISION NOT NULL, response JSONB NOT NULL, "
+            "served_from_log BOOLEAN NOT NULL DEFAULT FALSE, model_ms REAL, habitability_ms REAL, "
+            "visualization_ms REAL, total_ms REAL)"
+        ).format(sql.Identifier(PREDICTIONS_TABLE)))
+        cur.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} (input_hash, model_version, id)").format(
+            sql.Identifier(f"{PREDICTIONS_TABLE}_lookup"), sql.Identifier(PREDICTIONS_TABLE)
+        ))
+
+    def copy_predictions(self, rows: list) -> dict:
+        """
+        Append prediction log rows with a single COPY
+
+        Args:
+            rows: Tuples in PREDICTION_LOG_COLUMNS order; input and response
+                  are JSON strings, None is stored as NULL
+
+        Returns:
+            dict: Status information about the operation
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            self.ensure_prediction_log(cur)
+            cur.copy_expert(sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(PREDICTIONS_TABLE),
+                sql.SQL(', ').join(map(sql.Identifier, PREDICTION_LOG_COLUMNS))
+            ).as_string(conn), buffer)
+            conn.commit()
+            return {'success': True, 'rows_written': len(rows)}
+        except Exception as e:
+            if 'conn' in locals():
+                conn.rollback()
+            return {'success': False, 'error': str(e)}
+        finally:
+            if 'cur' in locals():
+                cur.close()
+            if 'conn' in locals():
+                conn.close()
+
+    def get_predictions(self, limit: int = 50, offset: int = 0, model_version: str = None,
+                        input_hash: str = None, prediction: int = None) -> list:
+        """
+        Logged predictions, newest first, optionally filtered
+
+        Returns:
+            list: One dict per logged prediction
+        """
+        filters, params = [], []
+        for column, value in (('model_version', model_version), ('input_hash', input_hash),
+                              ('prediction', prediction)):
+            if value is not None:
+                filters.append(sql.SQL("{} = %s").format(sql.Identifier(column)))
+                params.append(value)
+        where = sql.SQL(" WHERE ") + sql.SQL(" AND ").join(filters) if filters else sql.SQL("")
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SELECT to_regclass(%s)"), (PREDICTIONS_TABLE,))
+                if cur.fetchone()[0] is None:
+                    return []
+                cur.execute(sql.SQL("SELECT id, {} FROM {}{} ORDER BY id DESC LIMIT %s OFFSET %s").format(
+                    sql.SQL(', ').join(map(sql.Identifier, PREDICTION_LOG_COLUMNS)),
+                    sql.Identifier(PREDICTIONS_TABLE), where
+                ), params + [limit, offset])
+                columns = [desc[0] for desc in cur.description]
+                return [dict(zip(columns, row)) for row in cur.fetchall()]
+        finally:
+            conn.close()
+
+    def reusable_predictions(self, after_id: int = 0, limit: int = 1024) -> list:
+        """
+        The `limit` newest positive predictions logged after `after_id` whose
+        habitability analysis or visualization succeeded
+
+        Returns:
+            list: (id, input_hash, model_version, response) tuples, oldest first
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("SELECT to_regclass(%s)"), (PREDICTIONS_TABLE,))
+                if cur.fetchone()[0] is None:
+                    return []
+                cur.execute(sql.SQL(
+                    "SELECT id, input_hash, model_version, response FROM {} "
+                    "WHERE id > %s AND prediction = 1 AND (response->'habitability'->>'success' = 'true' "
+                    "OR response->'visualization'->>'success' = 'true') ORDER BY id DESC LIMIT %s"
+                ).format(sql.Identifier(PREDICTIONS_TABLE)), (after_id, limit))
+                return cur.fetchall()[::-1]
+        finally:
+            conn.close()
 
     def get_row_count(self) -> dict:
         """
@@ -128,7 +622,8 @@ class DatabaseManager:
 
 # Example usage
 if __name__ == "__main__":
-    db = DatabaseManager(table_name='tess_dataset')
+    from artifacts import load_feature_names
+    db = DatabaseManager(table_name='tess_dataset', feature_names=load_feature_names())
 
     # Add CSV to database
     result = db.add_csv_to_database('cleaned_data.csv')
@@ -0,0 +1,200 @@
+"""
+Drift Monitoring Module
+Streaming per-feature statistics of served inputs, compared with the training data
+"""
+
+import time
+import threading
+import numpy as np
+
+DRIFT_BINS = 10             # histogram bins per feature, at training-data deciles
+PSI_MODERATE = 0.1          # conventional PSI thresholds
+PSI_SIGNIFICANT = 0.25
+PSI_EPSILON = 1e-4          # smoothing for bins that are empty on one side
+MIN_ROWS = 500              # observations needed before a retrain is recommended
+RETRAIN_MIN_FEATURES = 3    # significantly drifted features that recommend a retrain
+OBSERVE_CHUNK_ROWS = 8192   # rows binned at once, bounds the temporary arrays
+
+
+def _bin_edges(values, n_bins):
+    """
+    Inner decile edges of one feature, moved to the midpoint between the
+    neighbouring distinct training values. Discrete features have many ties
+    at their quantiles; with no training value on an edge, the float32
+    rounding of scaled request values cannot flip them into the next bin.
+    """
+    edges = np.full(n_bins - 1, np.inf)
+    if len(values) == 0:
+        return edges
+    distinct = np.unique(values)
+    quantiles = np.quantile(values, np.arange(1, n_bins) / n_bins)
+    upper = np.searchsorted(distinct, quantiles, side='right')
+    has_upper = upper < len(distinct)
+    lower = distinct[upper[has_upper] - 1]
+    edges[has_upper] = (lower + distinct[upper[has_upper]]) / 2
+    return edges
+
+
+def reference_statistics(X, n_bins=DRIFT_BINS):
+    """
+    Reference distribution of raw training features, saved with the model.
+
+    Returns an (n_features, 2 * n_bins) array; per feature: the n_bins - 1
+    inner bin edges, the share of training rows in each of the n_bins bins,
+    and the share of missing values. Means and spreads are not repeated here,
+    they are the scaler's.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_rows, n_features = X.shape
+    reference = np.zeros((n_features, 2 * n_bins))
+    for i in range(n_features):
+        column = X[:, i]
+        present = column[~np.isnan(column)]
+        edges = _bin_edges(present, n_bins)
+        counts = np.bincount(np.searchsorted(edges, present), minlength=n_bins)
+        reference[i, :n_bins - 1] = edges
+        reference[i, n_bins - 1:-1] = counts / max(n_rows, 1)
+        reference[i, -1] = (n_rows - len(present)) / max(n_rows, 1)
+    return reference
+
+
+def _status(psi):
+    if psi >= PSI_SIGNIFICANT:
+        return 'significant'
+    if psi >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+class DriftMonitor:
+    """
+    Running statistics of the scaled feature rows sent to the model.
+
+    Per feature it keeps a Welford mean/variance, a missing count and a
+    histogram over the training bins, so memory is fixed by the number of
+    features and each row costs O(1) per feature. Values are observed after
+    scaling, which makes the reference mean 0 and standard deviation 1.
+    Imputed values count as missing, not as the value filled in.
+    """
+
+    def __init__(self, feature_names, reference, mean, scale, model_version=None):
+        self.feature_names = list(feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        self.model_version = model_version
+        reference = np.asarray(reference, dtype=np.float64)
+        self.n_bins = reference.shape[1] // 2
+
+        # Edges go through the same scaling and float32 rounding as the request values
+        edges = reference[:, :self.n_bins - 1]
+        mean = np.asarray(mean, dtype=np.float64)[:, None]
+        scale = np.asarray(scale, dtype=np.float64)[:, None]
+        self.scaled_edges = ((edges - mean) / scale).astype(np.float32)
+        self.reference_bins = reference[:, self.n_bins - 1:-1]
+        self.reference_missing = reference[:, -1]
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new observation window"""
+        n_features = len(self.feature_names)
+        with self._lock:
+            self.rows = 0
+            self.count = np.zeros(n_features, dtype=np.int64)
+            self.mean = np.zeros(n_features)
+            self.m2 = np.zeros(n_features)
+            self.missing = np.zeros(n_features, dtype=np.int64)
+            self.histogram = np.zeros((n_features, self.n_bins), dtype=np.int64)
+            self.started_at = time.time()
+
+    def observe(self, X, imputed=None):
+        """
+        Add encoded rows (the (n_rows, n_features) array given to the model)
+        and, per row, the names of the features that were imputed
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(self.feature_names))
+        for start in range(0, len(X), OBSERVE_CHUNK_ROWS):
+            rows = X[start:start + OBSERVE_CHUNK_ROWS]
+            missing = np.isnan(rows)
+            if imputed:
+                for row, names in enumerate(imputed[start:start + OBSERVE_CHUNK_ROWS]):
+                    for name in names:
+                        missing[row, self.index[name]] = True
+            self._observe_chunk(rows, missing)
+
+    def _observe_chunk(self, rows, missing):
+        n_rows, n_features = rows.shape
+        present = ~missing
+
+        bins = (rows[:, :, None] > self.scaled_edges[None]).sum(axis=2)
+        flat = bins + (np.arange(n_features) * self.n_bins)[None, :]
+        histogram = np.bincount(flat[present], minlength=n_features * self.n_bins)
+
+        values = rows.astype(np.float64)
+        count = present.sum(axis=0)
+        chunk_mean = np.where(present, values, 0.0).sum(axis=0) / np.maximum(count, 1)
+        chunk_m2 = (np.where(present, values - chunk_mean, 0.0) ** 2).sum(axis=0)
+
+        with self._lock:
+            # Chan et al.'s merge of two Welford states; for a single row it is Welford's update
+            total = self.count + count
+            delta = chunk_mean - self.mean
+            weight = count / np.maximum(total, 1)
+            self.mean += delta * weight
+            self.m2 += chunk_m2 + delta ** 2 * self.count * weight
+            self.count = total
+            self.missing += missing.sum(axis=0)
+            self.histogram += histogram.reshape(n_features, self.n_bins)
+            self.rows += n_rows
+
+    def report(self):
+        """Per-feature PSI / KS scores against the training data and an overall verdict"""
+        with self._lock:
+            rows = self.rows
+            count, mean, m2 = self.count.copy(), self.mean.copy(), self.m2.copy()
+            missing, histogram = self.missing.copy(), self.histogram.copy()
+            started_at = self.started_at
+
+        live = np.hstack([histogram, missing[:, None]]) / max(rows, 1)
+        reference = np.hstack([self.reference_bins, self.reference_missing[:, None]])
+        p, q = live + PSI_EPSILON, reference + PSI_EPSILON
+        psi = ((p - q) * np.log(p / q)).sum(axis=1)
+
+        # KS statistic on the binned distributions of the non-missing values
+        live_cdf = np.cumsum(histogram, axis=1) / np.maximum(count, 1)[:, None]
+        reference_cdf = np.cumsum(self.reference_bins, axis=1)
+        reference_cdf /= np.maximum(reference_cdf[:, -1:], PSI_EPSILON)
+        ks = np.abs(live_cdf - reference_cdf).max(axis=1)
+
+        std = np.sqrt(m2 / np.maximum(count - 1, 1))
+        features = []
+        for i, name in enumerate(self.feature_names):
+            observed = count[i] > 0
+            features.append({
+                'name': name,
+                'psi': float(psi[i]) if rows else None,
+                'ks': float(ks[i]) if observed else None,
+                'status': _status(psi[i]) if rows else None,
+                # In training standard deviations: 0 and 1 mean no shift
+                'mean_shift': float(mean[i]) if observed else None,
+                'std_ratio': float(std[i]) if count[i] > 1 else None,
+                'missing_rate': float(missing[i] / rows) if rows else None,
+                'reference_missing_rate': float(self.reference_missing[i])
+            })
+        features.sort(key=lambda f: -1.0 if f['psi'] is None else f['psi'], reverse=True)
+
+        drifted = [f['name'] for f in features if f['status'] == 'significant']
+        return {
+            'model_version': self.model_version,
+            'rows_observed': int(rows),
+            'window_started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started_at)),
+            'drifted_features': drifted,
+            'retrain_recommended': rows >= MIN_ROWS and len(drifted) >= RETRAIN_MIN_FEATURES,
+            'thresholds': {
+                'psi_moderate': PSI_MODERATE,
+                'psi_significant': PSI_SIGNIFICANT,
+                'min_rows': MIN_ROWS,
+                'retrain_min_features': RETRAIN_MIN_FEATURES
+            },
+            'features': features
+        }
@@ -0,0 +1,223 @@
+"""
+Feature Encoding Module
+Maps JSON feature payloads straight into scaled float32 model input
+"""
+
+import threading
+from types import SimpleNamespace
+import numpy as np
+import xgboost as xgb
+
+
+IMPUTATION_MODES = ('nan', 'median')
+
+
+def _is_missing(value):
+    return value is None or value == ''
+
+
+class FeatureEncoder:
+    """
+    Encoder compiled once from `feature_names` and a fitted StandardScaler.
+
+    Values are written into a contiguous float32 buffer in training column
+    order and standardized on the way in, so there is no intermediate list,
+    float64 array or scaler output copy. Standardization is computed in
+    double precision per value before the float32 store: raw columns such as
+    `pl_tranmid` (~2.46e6 BJD) do not survive a float32 round trip, their
+    standardized values do.
+
+    With `impute='nan'` absent or null features are passed to XGBoost as NaN
+    (its native missing value); with `impute='median'` they are filled with
+    the training-time medians, falling back to NaN for features that have no
+    stored median.
+    """
+
+    def __init__(self, feature_names, scaler, medians=None):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(self.n_features)
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(self.n_features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        # Plain Python floats are much faster than numpy scalars in the per-value loop
+        self._mean = self.mean.tolist()
+        self._inv_scale = (1.0 / self.scale).tolist()
+        self._local = threading.local()
+
+        # Training medians, kept already standardized so imputing is a plain store
+        self.has_medians = medians is not None
+        medians = medians or {}
+        raw_medians = np.array([medians.get(name, np.nan) for name in self.feature_names], dtype=np.float64)
+        self.scaled_medians = ((raw_medians - self.mean) / self.scale).astype(np.float32)
+
+    @classmethod
+    def from_arrays(cls, feature_names, mean, scale, medians=None):
+        """Build from raw standardization arrays instead of a fitted StandardScaler"""
+        return cls(feature_names, SimpleNamespace(mean_=mean, scale_=scale), medians)
+
+    def _fill_values(self, impute):
+        """Standardized value stored for each missing feature under `impute`"""
+        if impute == 'median':
+            return self.scaled_medians
+        if impute == 'nan':
+            return np.full(self.n_features, np.nan, dtype=np.float32)
+        raise ValueError(f"Unknown imputation mode '{impute}', expected one of {', '.join(IMPUTATION_MODES)}")
+
+    def _row_buffer(self):
+        """Per-thread (1, n_features) buffer reused across single predictions"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty((1, self.n_features), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
+
+    def _encode_into(self, record, row, fill=None, prefix=''):
+        missing = []
+        mean, inv_scale = self._mean, self._inv_scale
+        for i, name in enumerate(self.feature_names):
+            value = record.get(name)
+            if fill is not None and _is_missing(value):
+                row[i] = fill[i]
+                missing.append(name)
+                continue
+            if name not in record:
+                missing.append(name)
+                continue
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                raise ValueError(f'{prefix}Invalid value for {name}')
+            if fill is not None and value != value:
+                row[i] = fill[i]
+                missing.append(name)
+                continue
+            row[i] = (value - mean[i]) * inv_scale[i]
+
+        if missing and fill is None:
+            raise ValueError(f'{prefix}Missing features: {", ".join(missing)}')
+        return missing
+
+    def encode(self, record, impute=None):
+        """
+        Encode a single {feature: value} dict.
+
+        Returns `(X, imputed)`: X is a (1, n_features) float32 view of this
+        thread's reusable buffer, overwritten by the next call on the same
+        thread, and `imputed` lists the features that were filled in.
+        Without `impute`, missing or non-numeric features raise ValueError.
+        """
+        if not isinstance(record, dict):
+            raise ValueError('Expected an object of feature values')
+        fill = self._fill_values(impute) if impute is not None else None
+        buffer = self._row_buffer()
+        imputed = self._encode_into(record, buffer[0], fill)
+        return buffer, imputed
+
+    def encode_batch(self, data, impute=None):
+        """
+        Encode a batch given either as a list of {feature: value} records or
+        as a columnar {feature: [values, ...]} dict (e.g. parsed CSV columns).
+
+        Returns `(X, imputed)` with a freshly allocated (n_rows, n_features)
+        float32 array and, per row, the list of imputed features.
+        """
+        fill = self._fill_values(impute) if impute is not None else None
+
+        if isinstance(data, dict):
+            return self._encode_columns(data, fill)
+
+        if not isinstance(data, list):
+            raise ValueError('Batch must be a list of records or a dict of columns')
+
+        out = np.empty((len(data), self.n_features), dtype=np.float32)
+        imputed = []
+        for row_index, record in enumerate(data):
+            if not isinstance(record, dict):
+                raise ValueError(f'Row {row_index}: expected an object of feature values')
+            imputed.append(self._encode_into(record, out[row_index], fill, prefix=f'Row {row_index}: '))
+        return out, imputed
+
+    def _encode_columns(self, columns, fill):
+        present = [name for name in self.feature_names if name in columns]
+        missing = [name for name in self.feature_names if name not in columns]
+        if missing and fill is None:
+            raise ValueError(f'Missing features: {", ".join(missing)}')
+        if not present:
+            raise ValueError('No known feature columns provided')
+
+        for name in present:
+            if not isinstance(columns[name], (list, tuple, np.ndarray)) or np.ndim(columns[name]) != 1:
+                raise ValueError(f'Column {name} must be a list of values')
+
+        lengths = {len(columns[name]) for name in present}
+        if len(lengths) != 1:
+            raise ValueError('All feature columns must have the same length')
+        n_rows = lengths.pop()
+
+        out = np.empty((n_rows, self.n_features), dtype=np.float32)
+        missing_mask = np.zeros((n_rows, self.n_features), dtype=bool) if fill is not None else None
+        for i, name in enumerate(self.feature_names):
+            if name not in columns:
+                out[:, i] = fill[i]
+                missing_mask[:, i] = True
+                continue
+            values = columns[name]
+            if not (isinstance(values, np.ndarray) and values.dtype.kind in 'fiu'):
+                # None and '' become NaN here, so they are validated below
+                values = [np.nan if _is_missing(v) else v for v in values]
+            try:
+                # Always a private copy: it is standardized in place below
+                column = np.array(values, dtype=np.float64)
+            except (ValueError, TypeError):
+                raise ValueError(f'Invalid value for {name}')
+            nan_mask = np.isnan(column)
+            if nan_mask.any():
+                if fill is None:
+                    raise ValueError(f'Invalid value for {name}')
+                missing_mask[:, i] = nan_mask
+            column -= self.mean[i]
+            column /= self.scale[i]
+            out[:, i] = column
+            if fill is not None:
+                out[nan_mask, i] = fill[i]
+
+        if fill is None:
+            return out, [[] for _ in range(n_rows)]
+        names = np.array(self.feature_names, dtype=object)
+        return out, [names[row].tolist() for row in missing_mask]
+
+
+def _iteration_range(model):
+    """Trees used for prediction, honouring early stopping like XGBClassifier does"""
+    best_iteration = getattr(model, 'best_iteration', None)
+    return (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+
+def predict_proba(model, X):
+    """
+    Positive-class probabilities for already-encoded float32 rows.
+
+    Goes through Booster.inplace_predict, which reads the numpy buffer
+    directly instead of building a DMatrix, and honours early stopping the
+    same way XGBClassifier.predict_proba does.
+    """
+    booster = model.get_booster()
+    return booster.inplace_predict(X, iteration_range=_iteration_range(model))
+
+
+def feature_contributions(model, X, feature_names):
+    """
+    Exact TreeSHAP attributions for already-encoded rows, in log-odds.
+
+    Uses XGBoost's native pred_contribs, which runs over the whole batch in
+    one call. Returns `(contributions, bias)`: an (n_rows, n_features) array
+    and the per-row base value; together they sum to the model's margin.
+    """
+    booster = model.get_booster()
+    dmatrix = xgb.DMatrix(X, feature_names=list(feature_names))
+    contribs = booster.predict(dmatrix, pred_contribs=True, iteration_range=_iteration_range(model))
+    return contribs[:, :-1], contribs[:, -1]
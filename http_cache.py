@@ -0,0 +1,97 @@
+"""
+HTTP Caching Module
+Precompressed, conditional and range-capable responses
+"""
+
+import os
+import gzip
+import shutil
+import hashlib
+from flask import request, json, send_file, current_app
+from atomic_write import write_atomically
+
+GZIP_LEVEL = 6
+GZIP_SUFFIX = '.gz'
+
+
+def accepts_gzip():
+    """True when the client sent Accept-Encoding: gzip"""
+    return request.accept_encodings['gzip'] > 0
+
+
+def gzip_file(path):
+    """
+    Return the path of a gzip copy of `path`, (re)compressing it if missing
+    or stale.
+
+    The copy carries the source's mtime, which is how staleness is detected
+    and what its Last-Modified header reports. It is written through a
+    temporary file, so concurrent requests never serve a partial archive.
+    """
+    gz_path = path + GZIP_SUFFIX
+    source_mtime = os.stat(path).st_mtime_ns
+    if os.path.exists(gz_path) and os.stat(gz_path).st_mtime_ns == source_mtime:
+        return gz_path
+
+    def compress(tmp_path):
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(filename=os.path.basename(path), mode='wb', compresslevel=GZIP_LEVEL,
+                               fileobj=raw, mtime=source_mtime // 10**9) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.utime(tmp_path, ns=(source_mtime, source_mtime))
+
+    write_atomically(gz_path, compress)
+    return gz_path
+
+
+def send_precompressed(path, mimetype, download_name):
+    """
+    send_file for large downloads: the gzip copy is served with
+    Content-Encoding: gzip to clients that accept it. Either way the response
+    carries ETag/Last-Modified and answers If-None-Match/If-Modified-Since
+    with 304.
+
+    Range and If-Range requests always get the uncompressed file (206):
+    a client resuming a transparently decompressed download asks for an
+    offset into the decompressed data it has kept, not into the gzip stream.
+    """
+    resuming = 'Range' in request.headers or 'If-Range' in request.headers
+    compressed = accepts_gzip() and not resuming
+    response = send_file(
+        os.path.abspath(gzip_file(path) if compressed else path),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True
+    )
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class PrecomputedJSON:
+    """
+    A JSON payload serialized and gzipped once, served with an ETag derived
+    from `version` and the body, and a public Cache-Control max-age.
+    """
+
+    def __init__(self, payload, version, max_age):
+        self.version = version
+        self.max_age = max_age
+        self.body = json.dumps(payload).encode()
+        self.gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        self.etag = f"{version}-{hashlib.sha256(self.body).hexdigest()[:16]}"
+
+    def response(self):
+        compressed = accepts_gzip()
+        response = current_app.response_class(self.gzipped if compressed else self.body,
+                                              mimetype='application/json')
+        if compressed:
+            response.headers['Content-Encoding'] = 'gzip'
+        # Each encoding is a different representation with its own ETag
+        response.set_etag(f"{self.etag}-gzip" if compressed else self.etag)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        return response.make_conditional(request)
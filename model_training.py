@@ -8,8 +8,19 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import roc_auc_score
 import xgboost as xgb
-import joblib
+from artifacts import save_artifacts
+from drift import reference_statistics
 import os
+import shutil
+import tempfile
+
+LABEL_COLUMN = 'tfopwg_disp'
+
+# Out-of-core training settings
+SPLIT_BUCKETS = 10          # hash buckets: 0-5 train, 6-7 validation, 8-9 test (60/20/20)
+TRAIN, VALIDATION, TEST = 0, 1, 2
+MEDIAN_SAMPLE_SIZE = 20000  # rows kept to estimate training medians and drift reference bins
+AUC_BINS = 10000            # probability histogram resolution for the streamed test AUC
 
 def train_model(df):
     """
@@ -22,6 +33,12 @@ def train_model(df):
     y = df['tfopwg_disp']
     X = df.drop(columns=['tfopwg_disp'])
     
+    # Training medians let the API impute features missing from a request
+    feature_medians = {col: float(value) for col, value in X.median().items() if pd.notna(value)}
+
+    # Training distribution the drift monitor compares served requests with
+    drift_reference = reference_statistics(X.to_numpy(dtype=np.float64))
+    
     # Apply normalization
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
@@ -74,10 +91,7 @@ def train_model(df):
     }).sort_values('importance', ascending=False)
     
     # Save models and preprocessing objects
-    os.makedirs('models', exist_ok=True)
-    joblib.dump(xgb_model, 'models/xgb_model.pkl')
-    joblib.dump(scaler, 'models/scaler.pkl')
-    joblib.dump(list(X_scaled.columns), 'models/feature_names.pkl')
+    save_artifacts(xgb_model, scaler.mean_, scaler.scale_, list(X_scaled.columns), feature_medians, drift_reference)
     
     # Prepare results
     results = {
@@ -92,3 +106,186 @@ def train_model(df):
     }
     
     return results
+
+
+def iter_csv_chunks(csv_path, chunksize=50000):
+    """Chunk source over a CSV snapshot, for train_model_out_of_core"""
+    return lambda: pd.read_csv(csv_path, chunksize=chunksize)
+
+
+def split_assignment(X_chunk):
+    """
+    Deterministic train/validation/test assignment from a hash of each row's
+    feature values, so splits never need to be materialized and a row lands
+    in the same split on every pass (and duplicates never straddle splits).
+    """
+    hashes = pd.util.hash_pandas_object(X_chunk, index=False).to_numpy()
+    buckets = hashes % SPLIT_BUCKETS
+    return np.where(buckets < 6, TRAIN, np.where(buckets < 8, VALIDATION, TEST))
+
+
+def _prepare_chunk(chunk, feature_names):
+    X = chunk[feature_names].astype(np.float64)
+    y = chunk[LABEL_COLUMN].to_numpy(dtype=np.float32)
+    return X, y, split_assignment(X)
+
+
+class _SplitIter(xgb.DataIter):
+    """Feeds the scaled rows of one split to XGBoost, one chunk at a time"""
+
+    def __init__(self, chunk_source, feature_names, scaler, split, cache_prefix):
+        super().__init__(cache_prefix=cache_prefix)
+        self.chunk_source = chunk_source
+        self.feature_names = feature_names
+        self.scaler = scaler
+        self.split = split
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter(self.chunk_source())
+        for chunk in self._chunks:
+            X, y, splits = _prepare_chunk(chunk, self.feature_names)
+            mask = splits == self.split
+            if not mask.any():
+                continue
+            X_scaled = self.scaler.transform(X.to_numpy()[mask]).astype(np.float32)
+            input_data(data=X_scaled, label=y[mask], feature_names=self.feature_names)
+            return 1
+        return 0
+
+    def reset(self):
+        self._chunks = None
+
+
+def _external_memory_matrix(data_iter, ref=None):
+    if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+        # xgboost >= 3.0: quantized pages cached under the iterator's cache_prefix
+        return xgb.ExtMemQuantileDMatrix(data_iter, ref=ref)
+    # Older versions: iterator-backed DMatrix with an on-disk page cache
+    return xgb.DMatrix(data_iter)
+
+
+def _binned_auc(pos_hist, neg_hist):
+    """ROC AUC from per-bin positive/negative counts of predicted probability"""
+    n_pos, n_neg = pos_hist.sum(), neg_hist.sum()
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    neg_below = np.cumsum(neg_hist) - neg_hist
+    return float((pos_hist * (neg_below + 0.5 * neg_hist)).sum() / (n_pos * n_neg))
+
+
+def train_model_out_of_core(chunk_source):
+    """
+    Train XGBoost without ever holding the dataset in memory
+    `chunk_source` is a zero-argument callable returning a fresh iterator of
+    DataFrame chunks (e.g. DatabaseManager.iter_chunks or iter_csv_chunks);
+    it is called once per pass over the data.
+    Peak memory is bounded by the chunk size, not the dataset size.
+    Returns the same metrics as train_model and saves the same model files
+    """
+    print("Starting out-of-core model training...")
+
+    # Pass 1: scaler statistics, split sizes, label ratio and a median sample
+    scaler = StandardScaler()
+    feature_names = None
+    split_sizes = np.zeros(3, dtype=np.int64)
+    positives = 0
+    rng = np.random.default_rng(42)
+    sample, sample_keys = None, None
+
+    for chunk in chunk_source():
+        if feature_names is None:
+            feature_names = [col for col in chunk.columns if col != LABEL_COLUMN]
+        X, y, splits = _prepare_chunk(chunk, feature_names)
+        scaler.partial_fit(X.to_numpy())
+        split_sizes += np.bincount(splits, minlength=3)
+        positives += int(y.sum())
+
+        # Bottom-k sampling on random keys keeps a uniform sample of bounded size
+        keys = rng.random(len(X))
+        if sample is None:
+            sample, sample_keys = X.to_numpy(), keys
+        else:
+            sample = np.vstack([sample, X.to_numpy()])
+            sample_keys = np.concatenate([sample_keys, keys])
+        if len(sample_keys) > MEDIAN_SAMPLE_SIZE:
+            keep = np.argpartition(sample_keys, MEDIAN_SAMPLE_SIZE)[:MEDIAN_SAMPLE_SIZE]
+            sample, sample_keys = sample[keep], sample_keys[keep]
+
+    if feature_names is None:
+        raise ValueError("No training data provided")
+    dataset_size = int(split_sizes.sum())
+
+    medians = np.nanmedian(sample, axis=0)
+    feature_medians = {col: float(value) for col, value in zip(feature_names, medians) if not np.isnan(value)}
+    drift_reference = reference_statistics(sample)
+
+    xgb_params = {
+        'objective': 'binary:logistic',
+        'eval_metric': 'logloss',
+        'tree_method': 'hist',
+        'max_depth': 6,
+        'learning_rate': 0.1,
+        'subsample': 0.8,
+        'colsample_bytree': 0.8,
+        'seed': 42
+    }
+
+    cache_dir = tempfile.mkdtemp(prefix='xgb_cache_')
+    try:
+        # Pass 2+: XGBoost pulls scaled chunks through the iterators
+        train_iter = _SplitIter(chunk_source, feature_names, scaler, TRAIN, os.path.join(cache_dir, 'train'))
+        val_iter = _SplitIter(chunk_source, feature_names, scaler, VALIDATION, os.path.join(cache_dir, 'val'))
+        dtrain = _external_memory_matrix(train_iter)
+        dval = _external_memory_matrix(val_iter, ref=dtrain)
+
+        booster = xgb.train(
+            xgb_params, dtrain,
+            num_boost_round=100,
+            evals=[(dval, 'validation')],
+            early_stopping_rounds=10,
+            verbose_eval=False
+        )
+        del dtrain, dval
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Final pass: streamed test AUC from probability histograms
+    pos_hist = np.zeros(AUC_BINS, dtype=np.int64)
+    neg_hist = np.zeros(AUC_BINS, dtype=np.int64)
+    iteration_range = (0, booster.best_iteration + 1)
+    for chunk in chunk_source():
+        X, y, splits = _prepare_chunk(chunk, feature_names)
+        mask = splits == TEST
+        if not mask.any():
+            continue
+        X_scaled = scaler.transform(X.to_numpy()[mask]).astype(np.float32)
+        proba = booster.inplace_predict(X_scaled, iteration_range=iteration_range)
+        bins = np.minimum((proba * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+        pos_hist += np.bincount(bins[y[mask] == 1], minlength=AUC_BINS)
+        neg_hist += np.bincount(bins[y[mask] != 1], minlength=AUC_BINS)
+
+    # Normalized total gain, what XGBClassifier.feature_importances_ reports
+    gain = booster.get_score(importance_type='gain')
+    importance = np.array([gain.get(name, 0.0) for name in feature_names])
+    feature_importance = pd.DataFrame({
+        'feature': feature_names,
+        'importance': importance / importance.sum() if importance.sum() > 0 else importance
+    }).sort_values('importance', ascending=False)
+
+    save_artifacts(booster, scaler.mean_, scaler.scale_, feature_names, feature_medians, drift_reference)
+
+    results = {
+        'auc_score': _binned_auc(pos_hist, neg_hist),
+        'dataset_size': dataset_size,
+        'training_size': int(split_sizes[TRAIN]),
+        'validation_size': int(split_sizes[VALIDATION]),
+        'test_size': int(split_sizes[TEST]),
+        'exoplanet_ratio': float(positives / dataset_size) if dataset_size else 0.0,
+        'top_features': feature_importance.head(10).to_dict('records'),
+        'training_date': pd.Timestamp.now().isoformat(),
+        'mode': 'out_of_core'
+    }
+
+    return results
@@ -0,0 +1,236 @@
+"""
+Prediction Log Module
+Write-behind log of served predictions, persisted to Postgres in bulk
+"""
+
+import json
+import math
+import time
+import queue
+import atexit
+import hashlib
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
+import numpy as np
+
+QUEUE_SIZE = 10000      # entries buffered before new ones are dropped
+FLUSH_ROWS = 500        # flush as soon as this many entries are waiting...
+FLUSH_INTERVAL = 2.0    # ...or this many seconds after the oldest one arrived
+RECENT_SIZE = 1024      # latest reusable predictions kept in memory for lookups
+SYNC_INTERVAL = 30.0    # seconds between loads of other workers' entries from the table
+CLOSE_TIMEOUT = 5.0     # seconds allowed to drain the queue at exit
+
+
+def input_hash(X, impute=None, imputed=()):
+    """
+    Key of one encoded input row: its float32 model input plus how missing
+    values were handled, so equal requests hash equally regardless of how
+    the numbers were written in the JSON
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(X, dtype=np.float32).tobytes(), digest_size=16)
+    digest.update(f"{impute}|{','.join(imputed)}".encode())
+    return digest.hexdigest()
+
+
+def _finite(value):
+    """Replace NaN/Infinity (accepted by Python's JSON parser, rejected by JSONB) with null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _reusable(response):
+    """True when a logged response holds analysis results worth serving again"""
+    return any((response.get(key) or {}).get('success') for key in ('habitability', 'visualization'))
+
+
+def _to_json(value):
+    try:
+        return json.dumps(value, allow_nan=False)
+    except ValueError:
+        return json.dumps(_finite(value))
+
+
+class PredictionLog:
+    """
+    Bounded in-memory queue drained by a background thread into the
+    prediction log table with one COPY per batch.
+
+    `record` never blocks: when the queue is full the entry is dropped and
+    counted. Batches are written once FLUSH_ROWS entries are waiting or the
+    oldest has waited FLUSH_INTERVAL seconds. A failed write is counted and
+    dropped rather than retried, so a database outage cannot grow memory.
+    Entries should only carry the model's features as `input`, which keeps
+    their size, and so the queue's, bounded.
+
+    `lookup` never touches the database either. It reads the RECENT_SIZE
+    latest reusable positive predictions, recorded here or loaded from the
+    table by the same thread every SYNC_INTERVAL seconds, so candidates
+    analyzed by other workers or before a restart are found too.
+    """
+
+    def __init__(self, db, queue_size=QUEUE_SIZE, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.db = db
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.last_error = None
+        self.synced_id = 0
+        self.sync_failed = 0
+
+    def _start(self):
+        # Started on first use, in the process that serves requests
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def record(self, entry):
+        """
+        Queue one prediction; `entry` holds the PREDICTION_LOG_COLUMNS values,
+        with `input` and `response` as plain objects and `created_at` as a
+        Unix timestamp
+        """
+        if self._thread is None:
+            self._start()
+        with self._lock:
+            # Only positive predictions have analysis results worth reusing
+            if entry['prediction'] == 1 and _reusable(entry['response']):
+                self._remember(entry)
+            try:
+                self._queue.put_nowait(entry)
+                self.recorded += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def _remember(self, entry):
+        # Called with the lock held
+        key = (entry['input_hash'], entry['model_version'])
+        self._recent[key] = entry
+        self._recent.move_to_end(key)
+        while len(self._recent) > RECENT_SIZE:
+            self._recent.popitem(last=False)
+
+    def lookup(self, input_hash, model_version):
+        """
+        Latest logged reusable prediction for an input under a model version,
+        possibly not yet flushed, or None. Served from memory only, so a slow
+        or unreachable database never delays a request.
+        """
+        if self._thread is None:
+            self._start()
+        with self._lock:
+            entry = self._recent.get((input_hash, model_version))
+            if entry is not None:
+                self._recent.move_to_end((input_hash, model_version))
+            return entry
+
+    def _sync(self):
+        """Load reusable entries logged since the last sync, by any worker"""
+        try:
+            rows = self.db.reusable_predictions(after_id=self.synced_id, limit=RECENT_SIZE)
+        except Exception as e:
+            self.sync_failed += 1
+            print(f"⚠️  Prediction log sync failed: {e}")
+            return
+        with self._lock:
+            for row_id, row_hash, row_version, response in rows:
+                # Entries recorded here are newer than their flushed copy
+                if (row_hash, row_version) not in self._recent:
+                    self._remember({'input_hash': row_hash, 'model_version': row_version, 'response': response})
+        if rows:
+            self.synced_id = rows[-1][0]
+
+    def _run(self):
+        next_sync = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() >= next_sync:
+                self._sync()
+                next_sync = time.monotonic() + SYNC_INTERVAL
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        rows = [
+            (
+                datetime.fromtimestamp(entry['created_at'], timezone.utc).isoformat(),
+                entry['model_version'],
+                entry['input_hash'],
+                _to_json(entry['input']),
+                entry['prediction'],
+                entry['probability'],
+                _to_json(entry['response']),
+                entry.get('served_from_log', False),
+                entry.get('model_ms'),
+                entry.get('habitability_ms'),
+                entry.get('visualization_ms'),
+                entry.get('total_ms')
+            )
+            for entry in batch
+        ]
+        result = self.db.copy_predictions(rows)
+        if result.get('success'):
+            self.written += len(rows)
+        else:
+            self.failed += len(rows)
+            self.last_error = result.get('error')
+            print(f"⚠️  Dropped {len(rows)} prediction log entries: {self.last_error}")
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.flush_rows:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        """Stop the flusher and drain the queue"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(CLOSE_TIMEOUT)
+        self.flush()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'last_error': self.last_error,
+            'cached': len(self._recent),
+            'sync_failed': self.sync_failed
+        }
@@ -0,0 +1,255 @@
+"""
+Request Profiling Module
+Opt-in, admin-only profiling of a single Flask request
+"""
+
+import os
+import sys
+import json
+import time
+import hmac
+import uuid
+import threading
+import tracemalloc
+from collections import Counter
+from flask import request, g, jsonify, send_file
+
+PROFILE_FOLDER = 'profiles'
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_QUERY_PARAM = 'profile_token'
+DEFAULT_INTERVAL_MS = 1.0
+TOP_ALLOCATIONS = 25
+DEFAULT_MAX_PROFILES = 100  # newest profiles kept on disk, older ones are deleted
+
+# Keep the profiler's own bookkeeping out of the allocation report
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+
+class StackSampler:
+    """
+    Sampling profiler for a single thread.
+
+    A background thread snapshots the target thread's stack every `interval`
+    seconds and counts identical stacks, which is exactly the collapsed-stack
+    format consumed by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+
+
+def _collapse(frame):
+    """Turn a frame chain into a `root;...;leaf` collapsed stack string"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _requested_token():
+    return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_PARAM)
+
+
+def _is_authorized(token):
+    """Profiling is disabled unless PROFILING_ADMIN_TOKEN is set"""
+    admin_token = os.getenv('PROFILING_ADMIN_TOKEN')
+    # compare_digest only accepts ASCII str, so compare bytes
+    return bool(admin_token) and token is not None and hmac.compare_digest(token.encode(), admin_token.encode())
+
+
+# tracemalloc is process-wide: it stays on while any profiled request runs
+_tracing_lock = threading.Lock()
+_active_profiles = 0
+_started_tracing = False
+
+
+def _acquire_tracing():
+    global _active_profiles, _started_tracing
+    with _tracing_lock:
+        if _active_profiles == 0:
+            # Leave tracemalloc alone if someone else turned it on
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _active_profiles += 1
+
+
+def _release_tracing():
+    global _active_profiles
+    with _tracing_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0 and _started_tracing:
+            tracemalloc.stop()
+
+
+def _allocation_stats(diff):
+    """Summarize memory allocated since the request started, by source line"""
+    return [
+        {
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_diff_bytes': stat.size_diff,
+            'count_diff': stat.count_diff
+        }
+        for stat in diff[:TOP_ALLOCATIONS]
+    ]
+
+
+def _prune_profiles():
+    """Delete all but the newest PROFILING_MAX_PROFILES stored profiles"""
+    keep = int(os.getenv('PROFILING_MAX_PROFILES', DEFAULT_MAX_PROFILES))
+    profiles = []
+    for name in os.listdir(PROFILE_FOLDER):
+        profile_id, extension = os.path.splitext(name)
+        if extension != '.json':
+            continue
+        try:
+            profiles.append((os.path.getmtime(os.path.join(PROFILE_FOLDER, name)), profile_id))
+        except FileNotFoundError:
+            continue  # pruned by a concurrent request
+    profiles.sort(reverse=True)
+    for _, profile_id in profiles[keep:]:
+        for extension in ('.json', '.collapsed'):
+            try:
+                os.remove(os.path.join(PROFILE_FOLDER, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def _start_profiling():
+    if request.path.startswith('/api/profiles/'):
+        return
+    token = _requested_token()
+    if token is None or not _is_authorized(token):
+        return
+
+    g.profile_id = uuid.uuid4().hex
+    _acquire_tracing()
+    g.profile_baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+    interval_ms = float(os.getenv('PROFILING_INTERVAL_MS', DEFAULT_INTERVAL_MS))
+    g.profile_sampler = StackSampler(threading.get_ident(), interval_ms / 1000.0).start()
+    g.profile_start = time.perf_counter()
+
+
+def _finish_profiling(response):
+    sampler = g.pop('profile_sampler', None)
+    if sampler is None:
+        return response
+
+    wall_time = time.perf_counter() - g.profile_start
+    stacks = sampler.stop()
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+    current, peak = tracemalloc.get_traced_memory()
+    allocations = _allocation_stats(snapshot.compare_to(g.profile_baseline, 'lineno'))
+    _release_tracing()
+
+    profile_id = g.profile_id
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    collapsed_path = os.path.join(PROFILE_FOLDER, f"{profile_id}.collapsed")
+    with open(collapsed_path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    summary = {
+        'profile_id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'status_code': response.status_code,
+        'wall_time_ms': wall_time * 1000.0,
+        'samples': sampler.samples,
+        'sample_interval_ms': sampler.interval * 1000.0,
+        'memory': {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top_allocations': allocations
+        },
+        'collapsed_stacks': f"/api/profiles/{profile_id}?format=collapsed",
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(os.path.join(PROFILE_FOLDER, f"{profile_id}.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    _prune_profiles()
+
+    print(f"🔬 Profiled {request.method} {request.path}: {summary['wall_time_ms']:.1f} ms, "
+          f"{sampler.samples} samples, peak {peak / 1024:.1f} KiB -> {profile_id}")
+
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def _abort_profiling(exc):
+    """Stop the sampler if the request died before after_request ran"""
+    sampler = g.pop('profile_sampler', None)
+    if sampler is not None:
+        sampler.stop()
+        _release_tracing()
+
+
+def init_profiling(app):
+    """
+    Register the profiling hooks and the profile retrieval endpoint.
+
+    A request is profiled when it carries the admin token either in the
+    X-Profile-Token header or the `profile_token` query parameter. The
+    response gets an X-Profile-Id header; the profile itself is stored in
+    `profiles/` and served by GET /api/profiles/<id> (same token required).
+    Only the newest PROFILING_MAX_PROFILES profiles (default 100) are kept.
+
+    tracemalloc is process-wide, so allocation stats of a profiled request
+    include whatever concurrent requests allocate in the meantime, and
+    overlapping profiled requests share one peak, counted from the first.
+    """
+    app.before_request(_start_profiling)
+    app.after_request(_finish_profiling)
+    app.teardown_request(_abort_profiling)
+
+    @app.route('/api/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        """Return a stored profile summary, or its collapsed stacks"""
+        if not _is_authorized(_requested_token()):
+            return jsonify({'error': 'Profiling access denied'}), 403
+
+        # Profile ids are uuid4 hex strings, reject anything else
+        if len(profile_id) != 32 or not all(c in '0123456789abcdef' for c in profile_id):
+            return jsonify({'error': 'Invalid profile id'}), 400
+
+        if request.args.get('format') == 'collapsed':
+            path = os.path.join(PROFILE_FOLDER, f"{profile_id}.collapsed")
+            mimetype = 'text/plain'
+        else:
+            path = os.path.join(PROFILE_FOLDER, f"{profile_id}.json")
+            mimetype = 'application/json'
+
+        if not os.path.exists(path):
+            return jsonify({'error': 'Profile not found'}), 404
+
+        return send_file(os.path.abspath(path), mimetype=mimetype)
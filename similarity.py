@@ -0,0 +1,184 @@
+"""
+Similarity Search Module
+Nearest labelled catalog rows in the scaled feature space
+"""
+
+import os
+import hashlib
+import threading
+import joblib
+import numpy as np
+from sklearn.neighbors import BallTree
+from atomic_write import write_atomically
+from db import HASH_SCHEME
+
+INDEX_PATH = 'models/neighbors_index.pkl'
+LABEL_COLUMN = 'tfopwg_disp'
+HASH_COLUMN = 'row_hash'
+
+# Raw values returned with each neighbour so the UI can show what it resembles
+DISPLAY_FEATURES = ['pl_orbper', 'pl_rade', 'pl_insol', 'pl_eqt', 'st_teff', 'st_rad']
+
+# Rebuild the tree once unindexed additions exceed this share of it
+REBUILD_FRACTION = 0.1
+MIN_REBUILD_ROWS = 1000
+
+
+def scaler_fingerprint(feature_encoder):
+    """
+    Identifies the feature space and row keys; an index is only valid for
+    the scaler and row hash scheme it was built with
+    """
+    digest = hashlib.sha256()
+    digest.update(HASH_SCHEME.encode())
+    digest.update('\0'.join(feature_encoder.feature_names).encode())
+    digest.update(feature_encoder.mean.tobytes())
+    digest.update(feature_encoder.scale.tobytes())
+    return digest.hexdigest()
+
+
+def encode_points(feature_encoder, frame):
+    """
+    Scale catalog rows into index space
+    Missing values are set to 0, i.e. the training mean of the feature
+    """
+    columns = {name: frame[name].to_numpy() for name in frame.columns}
+    points, _ = feature_encoder.encode_batch(columns, impute='nan')
+    return np.nan_to_num(points, nan=0.0)
+
+
+class NeighborIndex:
+    """
+    BallTree over scaled catalog rows plus a small brute-force buffer of rows
+    added since the last build. New rows are searchable immediately; the
+    tree is rebuilt once the buffer grows past REBUILD_FRACTION of it.
+    """
+
+    def __init__(self, fingerprint, display_features):
+        self.fingerprint = fingerprint
+        self.display_features = list(display_features)
+        self.tree = None
+        self.labels = np.empty(0, dtype=np.int8)
+        self.keys = np.empty(0, dtype=object)
+        self.display = np.empty((0, len(self.display_features)), dtype=np.float64)
+        self.pending = None
+        self.pending_labels = np.empty(0, dtype=np.int8)
+        self.pending_keys = np.empty(0, dtype=object)
+        self.pending_display = np.empty((0, len(self.display_features)), dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels) + len(self.pending_labels)
+
+    @classmethod
+    def build(cls, feature_encoder, chunks):
+        """Build from an iterable of DataFrame chunks (schema columns plus row_hash)"""
+        index = cls(scaler_fingerprint(feature_encoder), DISPLAY_FEATURES)
+        for chunk in chunks:
+            index._append(feature_encoder, chunk)
+        index._rebuild()
+        return index
+
+    def add(self, feature_encoder, frame):
+        """Index newly ingested rows"""
+        with self._lock:
+            self._append(feature_encoder, frame)
+            threshold = max(MIN_REBUILD_ROWS, REBUILD_FRACTION * len(self.labels))
+            if len(self.pending_labels) > threshold:
+                self._rebuild()
+
+    def _append(self, feature_encoder, frame):
+        points = encode_points(feature_encoder, frame)
+        display = frame.reindex(columns=self.display_features).to_numpy(dtype=np.float64)
+        self.pending = points if self.pending is None else np.vstack([self.pending, points])
+        self.pending_labels = np.concatenate([self.pending_labels, frame[LABEL_COLUMN].to_numpy(dtype=np.int8)])
+        # Tables not yet migrated to content hashes have no row_hash column
+        keys = frame[HASH_COLUMN].to_numpy(dtype=object) if HASH_COLUMN in frame else np.full(len(frame), None)
+        self.pending_keys = np.concatenate([self.pending_keys, keys])
+        self.pending_display = np.vstack([self.pending_display, display])
+
+    def _rebuild(self):
+        if self.pending is None:
+            return
+        points = self.pending if self.tree is None else np.vstack([np.asarray(self.tree.data), self.pending])
+        self.tree = BallTree(points) if len(points) else None
+        self.labels = np.concatenate([self.labels, self.pending_labels])
+        self.keys = np.concatenate([self.keys, self.pending_keys])
+        self.display = np.vstack([self.display, self.pending_display])
+        self.pending = None
+        self.pending_labels = self.pending_labels[:0]
+        self.pending_keys = self.pending_keys[:0]
+        self.pending_display = self.pending_display[:0]
+
+    def _candidates(self, point, k):
+        """Up to k nearest (distance, position) pairs from the tree and the buffer"""
+        distances, positions = np.empty(0), np.empty(0, dtype=np.int64)
+        if self.tree is not None:
+            tree_k = min(k, len(self.labels))
+            distances, positions = self.tree.query(point.reshape(1, -1), k=tree_k)
+            distances, positions = distances[0], positions[0]
+        if self.pending is not None and len(self.pending):
+            pending_distances = np.sqrt(((self.pending - point) ** 2).sum(axis=1))
+            # Buffer rows are addressed after the tree rows
+            distances = np.concatenate([distances, pending_distances])
+            positions = np.concatenate([positions, np.arange(len(self.pending)) + len(self.labels)])
+        order = np.argsort(distances, kind='stable')[:k]
+        return distances[order], positions[order]
+
+    def _row(self, position):
+        if position < len(self.labels):
+            return self.labels[position], self.keys[position], self.display[position]
+        position -= len(self.labels)
+        return self.pending_labels[position], self.pending_keys[position], self.pending_display[position]
+
+    def query(self, point, k=5, label=None):
+        """
+        The k nearest catalog rows to a scaled point, optionally restricted
+        to one label (e.g. label=1 for confirmed planets)
+        """
+        point = np.nan_to_num(np.asarray(point, dtype=np.float64).ravel(), nan=0.0)
+        with self._lock:
+            total = len(self)
+            search_k = k
+            while True:
+                distances, positions = self._candidates(point, min(search_k, total))
+                rows = [(d, *self._row(p)) for d, p in zip(distances, positions)]
+                if label is not None:
+                    rows = [row for row in rows if row[1] == label]
+                # Widen the search until enough rows of the requested label turn up
+                if len(rows) >= k or search_k >= total:
+                    break
+                search_k *= 4
+
+        return [
+            {
+                'row_hash': key,
+                'distance': float(distance),
+                'label': int(row_label),
+                'is_exoplanet': bool(row_label == 1),
+                'features': {
+                    name: (None if np.isnan(value) else float(value))
+                    for name, value in zip(self.display_features, display)
+                }
+            }
+            for distance, row_label, key, display in rows[:k]
+        ]
+
+    def save(self, path=INDEX_PATH):
+        """Persist atomically so other workers never read a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            write_atomically(path, lambda tmp_path: joblib.dump(self, tmp_path))
+
+    @staticmethod
+    def load(path=INDEX_PATH):
+        return joblib.load(path)
@@ -0,0 +1,250 @@
+"""
+Streaming Upload Module
+Parses CSV uploads incrementally while the request body is being received
+"""
+
+import re
+import csv
+import time
+import queue
+import codecs
+import threading
+from collections import OrderedDict
+import pandas as pd
+from werkzeug.sansio.multipart import MultipartDecoder, File, Field, Data, Epilogue, NeedData
+
+READ_SIZE = 64 * 1024   # bytes read from the request stream at a time
+BATCH_ROWS = 5000       # parsed rows validated and inserted together
+MAX_JOBS = 100          # finished jobs kept for progress queries
+MAX_PENDING_BATCHES = 4 # parsed batches buffered ahead of a background ingest
+JOB_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def iter_request_file(stream, content_type, boundary=None, field_name='file', allowed_file=None):
+    """
+    Yield the bytes of an uploaded file as they arrive
+
+    multipart/form-data bodies are decoded incrementally and only the part
+    named `field_name` is passed through; any other body is treated as the
+    raw CSV. `allowed_file` validates the part's filename as soon as its
+    headers are received.
+    """
+    if content_type != 'multipart/form-data':
+        while True:
+            chunk = stream.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    if not boundary:
+        raise ValueError('Missing multipart boundary')
+
+    decoder = MultipartDecoder(boundary.encode())
+    in_file = False
+    found = False
+    while True:
+        chunk = stream.read(READ_SIZE)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                in_file = event.name == field_name
+                if in_file:
+                    found = True
+                    if not event.filename:
+                        raise ValueError('No file selected')
+                    if allowed_file is not None and not allowed_file(event.filename):
+                        raise ValueError('Only CSV files are allowed')
+            elif isinstance(event, Field):
+                in_file = False
+            elif isinstance(event, Data):
+                if in_file and event.data:
+                    yield event.data
+            elif isinstance(event, Epilogue):
+                if not found:
+                    raise ValueError('No file provided')
+                return
+            event = decoder.next_event()
+        if not chunk:
+            if not found:
+                raise ValueError('No file provided')
+            return
+
+
+def _iter_lines(chunks):
+    """Decode byte chunks into text lines, keeping line endings for the csv module"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line, keep it for the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+class CsvBatchParser:
+    """
+    Pull-based CSV parser over a stream of byte chunks
+
+    The header is read and validated before anything else, so a file with
+    the wrong columns is rejected after its first line. Iterating yields
+    validated float64 batches of BATCH_ROWS rows, each prepared by
+    `db.prepare_frame`, while the rest of the body is still arriving.
+    """
+
+    def __init__(self, chunks, db, batch_rows=BATCH_ROWS):
+        self.db = db
+        self.batch_rows = batch_rows
+        self._reader = csv.reader(_iter_lines(chunks))
+        try:
+            self.columns = next(self._reader)
+        except StopIteration:
+            raise ValueError('CSV file is empty')
+        self.ignored_columns = db.validate_columns(self.columns)
+
+    def __iter__(self):
+        rows = []
+        first_line = 2
+        for row in self._reader:
+            if not row:
+                continue  # blank line
+            if len(row) != len(self.columns):
+                raise ValueError(f"Line {self._reader.line_num}: expected {len(self.columns)} fields, got {len(row)}")
+            rows.append(row)
+            if len(rows) >= self.batch_rows:
+                yield self._prepare(rows, first_line)
+                first_line = self._reader.line_num + 1
+                rows = []
+        if rows:
+            yield self._prepare(rows, first_line)
+
+    def _prepare(self, rows, first_line):
+        return self.db.prepare_frame(pd.DataFrame(rows, columns=self.columns), first_line=first_line)
+
+
+class UploadJob:
+    """Progress of one upload, readable while it runs"""
+
+    def __init__(self, job_id, total_bytes=None):
+        self.job_id = job_id
+        self.status = 'running'
+        self.total_bytes = total_bytes
+        self.bytes_received = 0
+        self.body_complete = False
+        self.rows_received = 0
+        self.rows_inserted = 0
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def track(self, chunks):
+        """Pass byte chunks through while counting them"""
+        for chunk in chunks:
+            self.bytes_received += len(chunk)
+            yield chunk
+        self.body_complete = True
+
+    def progress(self, rows_received, rows_inserted):
+        self.rows_received = rows_received
+        self.rows_inserted = rows_inserted
+
+    def finish(self, result):
+        self.finished_at = time.time()
+        if result.get('success'):
+            self.status = 'completed'
+            self.result = result
+        else:
+            self.status = 'failed'
+            self.error = result.get('error')
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'body_complete': self.body_complete,
+            'bytes_received': self.bytes_received,
+            'total_bytes': self.total_bytes,
+            'rows_received': self.rows_received,
+            'rows_inserted': self.rows_inserted,
+            'duplicates_skipped': self.rows_received - self.rows_inserted,
+            'elapsed_seconds': (self.finished_at or time.time()) - self.started_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def create_job(job_id, total_bytes=None):
+    """Register a job under a client-chosen id so progress can be polled during the upload"""
+    if not JOB_ID_RE.match(job_id):
+        raise ValueError('job_id must be 1-64 letters, digits, - or _')
+    with _jobs_lock:
+        if job_id in _jobs and _jobs[job_id].finished_at is None:
+            raise ValueError(f"Upload job '{job_id}' is already running")
+        job = UploadJob(job_id, total_bytes)
+        _jobs[job_id] = job
+        _jobs.move_to_end(job_id)
+        # Forget the oldest finished jobs
+        while len(_jobs) > MAX_JOBS:
+            oldest_id, oldest = next(iter(_jobs.items()))
+            if oldest.finished_at is None:
+                break
+            del _jobs[oldest_id]
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def _drain(pending):
+    """Batches handed over by the request thread; re-raises its parse errors"""
+    while True:
+        item = pending.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def ingest_in_background(job, batches, ingest):
+    """
+    Run `ingest(batch_iterator)` on a worker thread while the calling
+    (request) thread keeps parsing and hands batches over a bounded queue.
+
+    Returns once the whole body has been parsed, so the response can be
+    sent while the last batches are still being written. A parse error is
+    forwarded to the worker, which rolls the ingest back, and re-raised.
+    """
+    pending = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+    worker = threading.Thread(target=lambda: job.finish(ingest(_drain(pending))), daemon=True)
+    worker.start()
+
+    def hand_over(item):
+        # Stop producing if the worker died (e.g. the database went away)
+        while worker.is_alive():
+            try:
+                pending.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for batch in batches:
+            if not hand_over(batch):
+                return
+    except Exception as e:
+        hand_over(e)
+        raise
+    hand_over(None)